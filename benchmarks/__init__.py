@@ -0,0 +1,3 @@
+"""
+The benchmarks package measures the performance of Smelly Python on synthetic pylint reports.
+"""
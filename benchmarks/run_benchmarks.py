@@ -0,0 +1,220 @@
+"""
+The run benchmarks module times and memory-profiles the phases of Smelly Python on synthetic
+pylint reports, and saves the results as JSON so that they can be compared between commits.
+Run it from the root of the repository with `python -m benchmarks.run_benchmarks`.
+"""
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from os import path
+
+import click
+
+from smelly_python.cache import CACHE_DIR_ENV
+from smelly_python.code_smell import Report
+from smelly_python.generator.md_generator import generate_md
+from smelly_python.generator.pylint_explanation_fetcher import ExplanationFetcher, SOURCE_PYLINT
+from smelly_python.generator.webpage_generator import generate_webpage, \
+    INDEX_TABLE, INDEX_VIRTUAL, CODE_CLIENT, CODE_HIGHLIGHTED, CODE_SNIPPET
+from smelly_python.report_index import ReportIndex
+from benchmarks.synthetic_report import write_source_tree, write_report
+
+DEFAULT_SIZES = [100, 1000, 10000, 100000]
+MIN_COMPARED_SECONDS = 0.05
+
+
+def measure(function, memory=True):
+    """
+    Measures a function. The function runs once to measure the time, and once more with
+    tracemalloc to measure the peak memory, as tracing slows it down.
+    :param: function the function to measure
+    :param: memory whether to measure the peak memory
+    :return: a tuple of the result of the function and a dictionary with the measurements
+    """
+    gc.collect()
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    result = function()
+    measurement = {
+        'wall_seconds': time.perf_counter() - start_wall,
+        'cpu_seconds': time.process_time() - start_cpu
+    }
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        function()
+        measurement['peak_memory_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, measurement
+
+
+def run_benchmark(smells, files, options):
+    """
+    Generates a synthetic source tree and report, and measures every phase on it.
+    :param: smells the number of code smells
+    :param: files the number of files
+    :param: options the options of the command line
+    :return: a dictionary with the measurements of every phase
+    """
+    phases = {}
+    memory = options['memory']
+    with tempfile.TemporaryDirectory(prefix='smelly_python-benchmark-') as directory:
+        sources = write_source_tree(directory, files, options['lines'])
+        report_path = path.join(directory, 'report.json')
+        write_report(report_path, sources, smells, options['seed'])
+
+        def load_json():
+            with open(report_path, 'r', encoding='utf-8') as report_file:
+                return json.load(report_file)
+
+        content, phases['json_load'] = measure(load_json, memory)
+        code_smells, phases['convert_dict'] = measure(
+            lambda: Report.convert_dict(content), memory)
+        del content
+        report = Report([], '5.00')
+        report.code_smells = code_smells
+        _, phases['index'] = measure(lambda: ReportIndex(code_smells), memory)
+        _, phases['group_by_file'] = measure(report.group_by_file, memory)
+
+        def load_explanations():
+            fetcher = ExplanationFetcher(source=SOURCE_PYLINT)
+            fetcher.load({smell.message_id for smell in code_smells})
+            return fetcher
+
+        explanations, phases['explanation_load'] = measure(load_explanations, memory)
+        _, phases['explanation_lookup'] = measure(
+            lambda: [explanations.get_explanation(smell.message_id) for smell in code_smells],
+            memory)
+
+        # Start from an empty cache, so that the runs do not depend on earlier runs
+        previous_cache_dir = os.environ.get(CACHE_DIR_ENV)
+        os.environ[CACHE_DIR_ENV] = path.join(directory, 'cache')
+        try:
+            phases.update(_measure_generators(report, explanations, directory, options))
+        finally:
+            if previous_cache_dir is None:
+                del os.environ[CACHE_DIR_ENV]
+            else:
+                os.environ[CACHE_DIR_ENV] = previous_cache_dir
+    return phases
+
+
+def _measure_generators(report, explanations, directory, options):
+    output_path = path.join(directory, 'report', 'smelly_python')
+    os.makedirs(output_path)
+    phases = {}
+    # The pages are generated from the working directory, like the command line does
+    working_directory = os.getcwd()
+    os.chdir(directory)
+    try:
+        _, phases['generate_webpage'] = measure(lambda: generate_webpage(
+            report, explanations, output_path, workers=options['workers'], clean=True,
+            index_mode=options['index_mode'], code_mode=options['code_mode']), options['memory'])
+        _, phases['generate_md'] = measure(
+            lambda: generate_md(report, explanations, output_path), options['memory'])
+        if options['archive']:
+            _, phases['generate_archive'] = measure(lambda: generate_webpage(
+                report, explanations, workers=options['workers'],
+                index_mode=options['index_mode'], code_mode=options['code_mode'],
+                archive=path.join(directory, 'report.tar.gz')), options['memory'])
+    finally:
+        os.chdir(working_directory)
+    return phases
+
+
+def _get_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=path.dirname(__file__)).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """
+    Prints the ratio of the wall time of every phase to the baseline.
+    :param: results the results of this run
+    :param: baseline the results of an earlier run
+    :param: threshold the ratio above which a phase is reported as a regression
+    :return: true if any phase regressed
+    """
+    previous = {(run['smells'], run['files']): run['phases'] for run in baseline['runs']}
+    regressed = False
+    for run in results['runs']:
+        for phase, measurement in run['phases'].items():
+            before = previous.get((run['smells'], run['files']), {}).get(phase)
+            # Phases that take a few milliseconds are too noisy to compare
+            if before is None or max(before['wall_seconds'],
+                                     measurement['wall_seconds']) < MIN_COMPARED_SECONDS:
+                continue
+            ratio = measurement['wall_seconds'] / before['wall_seconds']
+            regressed = regressed or ratio > threshold
+            print(f'{run["smells"]:>8} smells {phase:<20} {before["wall_seconds"]:9.3f}s '
+                  f'-> {measurement["wall_seconds"]:9.3f}s ({ratio:.2f}x)'
+                  f'{"  REGRESSION" if ratio > threshold else ""}')
+    return regressed
+
+
+@click.command()
+@click.option('--smells', '-s', type=click.IntRange(min=1), multiple=True,
+              help='Number of code smells to benchmark with, can be given multiple times. '
+                   f'Defaults to {", ".join(str(size) for size in DEFAULT_SIZES)}.')
+@click.option('--files', '-f', type=click.IntRange(min=1), default=100,
+              help='Number of files of the synthetic source tree.')
+@click.option('--lines', type=click.IntRange(min=1), default=300,
+              help='Approximate number of lines per file.')
+@click.option('--seed', type=int, default=0, help='Seed of the synthetic report.')
+@click.option('--workers', type=click.IntRange(min=1), default=1,
+              help='Number of processes that create the pages of the html report.')
+@click.option('--index-mode', type=click.Choice([INDEX_TABLE, INDEX_VIRTUAL]),
+              default=INDEX_TABLE, help='The index mode of the html report.')
+@click.option('--code-mode', type=click.Choice([CODE_CLIENT, CODE_HIGHLIGHTED, CODE_SNIPPET]),
+              default=CODE_CLIENT, help='The code mode of the html report.')
+@click.option('--archive', is_flag=True,
+              help='Also measure generating the html report into a compressed archive.')
+@click.option('--memory/--no-memory', default=True,
+              help='Also measure the peak memory of every phase, which runs it twice.')
+@click.option('--output', '-o', type=click.Path(dir_okay=False), default='benchmark.json',
+              help='File to save the results to.')
+@click.option('--baseline', type=click.Path(exists=True, dir_okay=False),
+              help='Results of an earlier run to compare with.')
+@click.option('--threshold', type=click.FloatRange(min=1), default=1.2,
+              help='Ratio of the wall time to the baseline above which a phase regressed.')
+def main(**options):
+    """
+    Benchmarks Smelly Python on synthetic reports of increasing size.
+    Exits with 1 if a phase regressed compared to the baseline.
+    """
+    results = {
+        'commit': _get_commit(),
+        'created': time.time(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'options': {key: value for key, value in options.items()
+                    if key not in ('output', 'baseline', 'threshold')},
+        'runs': []
+    }
+    for smells in options['smells'] or DEFAULT_SIZES:
+        print(f'Benchmarking {smells} code smells in {options["files"]} files...')
+        results['runs'].append({
+            'smells': smells,
+            'files': options['files'],
+            'phases': run_benchmark(smells, options['files'], options)
+        })
+        with open(options['output'], 'w', encoding='utf-8') as output_file:
+            json.dump(results, output_file, indent=2)
+    print(f'Saved the results to {options["output"]}')
+
+    if options['baseline']:
+        with open(options['baseline'], 'r', encoding='utf-8') as baseline_file:
+            if compare(results, json.load(baseline_file), options['threshold']):
+                sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()  # pylint: disable=no-value-for-parameter
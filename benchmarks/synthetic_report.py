@@ -0,0 +1,129 @@
+"""
+The synthetic report module generates source trees and matching pylint JSON reports of any
+size, so that Smelly Python can be benchmarked without analysing a real project.
+"""
+import json
+import os
+import random
+from os import path
+
+# Codes that pylint commonly reports, with their symbol, type, message and relative frequency
+MESSAGES = [
+    ('C0114', 'missing-module-docstring', 'convention', 'Missing module docstring', 6),
+    ('C0116', 'missing-function-docstring', 'convention',
+     'Missing function or method docstring', 10),
+    ('C0103', 'invalid-name', 'convention',
+     'Variable name "{name}" doesn\'t conform to snake_case naming style', 12),
+    ('C0301', 'line-too-long', 'convention', 'Line too long ({number}/100)', 8),
+    ('R0913', 'too-many-arguments', 'refactor', 'Too many arguments ({number}/5)', 4),
+    ('R1705', 'no-else-return', 'refactor',
+     'Unnecessary "else" after "return", remove the "else" and de-indent the code inside it',
+     4),
+    ('R0914', 'too-many-locals', 'refactor', 'Too many local variables ({number}/15)', 2),
+    ('W0611', 'unused-import', 'warning', 'Unused import {name}', 6),
+    ('W0612', 'unused-variable', 'warning', 'Unused variable \'{name}\'', 6),
+    ('W3101', 'missing-timeout', 'warning',
+     'Missing timeout argument for method \'requests.get\' can cause your program to hang '
+     'indefinitely', 2),
+    ('E1101', 'no-member', 'error', 'Instance of \'{name}\' has no \'{name}\' member', 2),
+    ('E0602', 'undefined-variable', 'error', 'Undefined variable \'{name}\'', 1),
+]
+
+NAMES = ['data', 'result', 'Model', 'config', 'value', 'parser', 'Session', 'x', 'df']
+
+# A block of python code that the source files repeat
+SOURCE_BLOCK = '''
+
+def function_{index}(data, {name}=None):
+    """
+    Processes the data.
+    """
+    result = []
+    for value in data:
+        if value is not None and {name} is None:
+            result.append(value * {index})
+    return result
+'''
+
+
+def get_source_paths(files, package='synthetic'):
+    """
+    Gets the relative paths of the files of a synthetic source tree.
+    The files are spread over nested packages of at most 20 modules each.
+    :param: files the number of files
+    :param: package the name of the top level package
+    :return: a list of relative paths
+    """
+    return [path.join(package, f'package_{index // 400}', f'subpackage_{index // 20 % 20}',
+                      f'module_{index}.py')
+            for index in range(files)]
+
+
+def write_source_tree(root, files, lines, package='synthetic'):
+    """
+    Writes a synthetic source tree.
+    :param: root the directory to write the tree to
+    :param: files the number of files
+    :param: lines the approximate number of lines per file
+    :param: package the name of the top level package
+    :return: a list with the relative path and number of lines of every file
+    """
+    sources = []
+    for index, source_path in enumerate(get_source_paths(files, package)):
+        blocks = [SOURCE_BLOCK.format(index=block, name=NAMES[(index + block) % len(NAMES)])
+                  for block in range(max(1, lines // SOURCE_BLOCK.count('\n')))]
+        content = f'import os\nimport sys\n{"".join(blocks)}'
+        full_path = path.join(root, source_path)
+        os.makedirs(path.dirname(full_path), exist_ok=True)
+        with open(full_path, 'w', encoding='utf-8') as source_file:
+            source_file.write(content)
+        sources.append((source_path, content.count('\n')))
+    return sources
+
+
+def generate_messages(sources, smells, seed=0):
+    """
+    Generates pylint messages for the files of a source tree.
+    Like in real projects, a few files have most of the messages.
+    :param: sources a list with the relative path and number of lines of every file
+    :param: smells the number of messages
+    :param: seed the seed of the random generator
+    :return: a generator of messages in the pylint JSON format
+    """
+    generator = random.Random(seed)
+    files = generator.choices(sources, [1 / (rank + 1) for rank in range(len(sources))],
+                              k=smells)
+    messages = generator.choices(MESSAGES, [message[4] for message in MESSAGES], k=smells)
+    for (source_path, line_count), (code, symbol, message_type, text, _) in zip(files, messages):
+        line = generator.randint(1, max(1, line_count))
+        column = generator.choice([0, 4, 8, 12])
+        yield {
+            'type': message_type,
+            'module': source_path[:-len('.py')].replace(os.sep, '.'),
+            'obj': f'function_{line // 11}' if line > 2 else '',
+            'line': line,
+            'column': column,
+            'endLine': line,
+            'endColumn': column + generator.randint(1, 40),
+            'path': source_path.replace(os.sep, '/'),
+            'symbol': symbol,
+            'message': text.format(name=generator.choice(NAMES),
+                                   number=generator.randint(6, 150)),
+            'message-id': code
+        }
+
+
+def write_report(report_path, sources, smells, seed=0):
+    """
+    Writes a synthetic pylint JSON report, one message at a time.
+    :param: report_path the path of the JSON file
+    :param: sources a list with the relative path and number of lines of every file
+    :param: smells the number of messages
+    :param: seed the seed of the random generator
+    """
+    with open(report_path, 'w', encoding='utf-8') as report_file:
+        report_file.write('[')
+        for index, message in enumerate(generate_messages(sources, smells, seed)):
+            report_file.write(',\n' if index > 0 else '\n')
+            report_file.write(json.dumps(message))
+        report_file.write('\n]\n')
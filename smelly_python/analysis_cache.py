@@ -0,0 +1,382 @@
+"""
+The analysis cache module stores the pylint messages of every analysed file, keyed by the hash
+of its contents, so that only changed files and the files that import them have to be analysed
+again.
+"""
+import ast
+import hashlib
+import json
+import os
+import re
+from os import path
+from pathlib import Path
+
+from smelly_python.cache import get_cache_dir, get_pylint_version, write_json
+
+CONFIG_FILES = ['pylintrc', '.pylintrc', 'pyproject.toml', 'setup.cfg', 'tox.ini']
+
+# The version of the format of the cache files, older cache files are ignored
+CACHE_FORMAT = 2
+
+# The messages pylint reports about several modules at the end of a run, on the last file
+PROJECT_SYMBOLS = ('duplicate-code', 'cyclic-import')
+
+
+def hash_file(file_path) -> str:
+    """
+    Hashes the contents of a file.
+    :param: file_path the path of the file
+    :return: the hex digest of the file contents
+    """
+    with open(file_path, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def get_config_files(directory='.'):
+    """
+    Finds the configuration files pylint could read when run from the directory,
+    including the file PYLINTRC points to and ~/.pylintrc.
+    :param: directory the directory pylint is run from
+    :return: the paths of the configuration files that exist
+    """
+    candidates = [path.join(directory, name) for name in CONFIG_FILES]
+    if os.environ.get('PYLINTRC'):
+        candidates.append(os.environ['PYLINTRC'])
+    candidates.append(path.join(Path.home(), '.pylintrc'))
+    return [candidate for candidate in candidates if path.isfile(candidate)]
+
+
+def hash_config(directory='.') -> str:
+    """
+    Hashes the configuration files pylint could read when run from the directory.
+    :param: directory the directory pylint is run from
+    :return: the hex digest of the configuration
+    """
+    digest = hashlib.sha256()
+    for config_file in get_config_files(directory):
+        digest.update(config_file.encode('utf-8'))
+        digest.update(hash_file(config_file).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def count_statements(file_path) -> int:
+    """
+    Counts the statements of a python file the same way pylint does for its evaluation.
+    :param: file_path the path of the file
+    :return: the number of statements, or 0 if the file cannot be parsed
+    """
+    import astroid  # pylint: disable=import-outside-toplevel
+
+    try:
+        with open(file_path, 'r', encoding='utf-8') as file:
+            nodes = [astroid.parse(file.read(), path=file_path)]
+    except (OSError, ValueError, astroid.AstroidError):
+        return 0
+    statements = 0
+    while nodes:
+        node = nodes.pop()
+        statements += 1 if node.is_statement else 0
+        nodes.extend(node.get_children())
+    return statements
+
+
+def get_module_name(file_path, packages=None) -> str:
+    """
+    Gets the name of the module of a python file, the way pylint names it: relative to the
+    first directory above it that is not a package.
+    :param: file_path the path of the file
+    :param: packages a dictionary that caches whether a directory is a package, or None
+    :return: the dotted module name
+    """
+    packages = packages if packages is not None else {}
+    directory, name = path.split(path.abspath(file_path))
+    parts = [] if name == '__init__.py' else [name[:-len('.py')]]
+    while True:
+        if directory not in packages:
+            packages[directory] = path.isfile(path.join(directory, '__init__.py'))
+        parent, package = path.split(directory)
+        if not packages[directory] or not package:
+            return '.'.join(parts)
+        parts.insert(0, package)
+        directory = parent
+
+
+def find_imports(file_path, module_name):
+    """
+    Finds the modules a python file imports, including the packages they are in and the
+    names imported from them, which may be modules as well.
+    :param: file_path the path of the file
+    :param: module_name the name of the module of the file, to resolve relative imports
+    :return: a sorted list of dotted module names, empty if the file cannot be parsed
+    """
+    try:
+        with open(file_path, 'rb') as file:
+            tree = ast.parse(file.read(), filename=file_path)
+    except (OSError, SyntaxError, ValueError):
+        return []
+    package = module_name.split('.') if path.basename(file_path) == '__init__.py' \
+        else module_name.split('.')[:-1]
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                _add_module(names, alias.name.split('.'))
+        elif isinstance(node, ast.ImportFrom):
+            if node.level > len(package) + 1:
+                continue
+            base = package[:len(package) - node.level + 1] if node.level else []
+            base += node.module.split('.') if node.module else []
+            _add_module(names, base)
+            for alias in node.names:
+                if alias.name != '*':
+                    _add_module(names, [*base, alias.name])
+    return sorted(names)
+
+
+def _add_module(names, parts):
+    for end in range(1, len(parts) + 1):
+        names.add('.'.join(parts[:end]))
+
+
+def _get_referenced_modules(message):
+    """
+    Gets the names of the modules a message about several modules refers to.
+    :return: a list of dotted module names
+    """
+    if message['symbol'] == 'cyclic-import':
+        cycle = re.search(r'\((.*)\)', message['message'])
+        return cycle.group(1).split(' -> ') if cycle is not None else []
+    return re.findall(r'^==([\w.]+):', message['message'], re.MULTILINE)
+
+
+def _get_key(file_path) -> str:
+    return path.normcase(path.abspath(file_path))
+
+
+class AnalysisCache:  # pylint: disable=too-many-instance-attributes
+    """
+    A cache of the pylint messages and statement counts per file of an analysed directory.
+    The whole cache is invalidated when the pylint version or the pylint configuration changes.
+    Every file is stored with the project files it imports, as pylint infers the types of the
+    imported names from them. A file is analysed again when it changes, when its imports are
+    resolved to other files, or when any file it imports, directly or indirectly, is analysed
+    again.
+    Messages about multiple modules, like duplicate-code, are kept until one of their modules
+    is analysed again, and the modules of a duplicate are analysed again together. New
+    duplicates between a changed file and an unchanged file are only found by a full run.
+    """
+
+    def __init__(self, directory, cache_dir=None):
+        cache_dir = Path(cache_dir) if cache_dir is not None else get_cache_dir()
+        # The messages contain the paths relative to the working directory
+        key = hashlib.sha256(f'{path.abspath(directory)}\0{os.getcwd()}'.encode('utf-8'))
+        self.path = cache_dir / 'analysis' / f'{key.hexdigest()[:16]}.json'
+        self.directory = directory
+        self.version = get_pylint_version()
+        self.config = hash_config()
+        self.files = {}
+        self.project_messages = []
+        self.config_messages = []
+        self.modules_changed = False
+        # The hash, module name, imports and dependencies of every file of the current run
+        self._current = {}
+        self._modules = {}
+        self._load()
+
+    @staticmethod
+    def clear(cache_dir=None):
+        """
+        Removes the cached analyses of all directories.
+        :param: cache_dir the cache directory, or None for the default directory
+        """
+        cache_dir = Path(cache_dir) if cache_dir is not None else get_cache_dir()
+        for file in (cache_dir / 'analysis').glob('*.json'):
+            file.unlink()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as cache_file:
+                content = json.load(cache_file)
+        except (OSError, ValueError):
+            return
+        if content.get('format') == CACHE_FORMAT and content.get('version') == self.version \
+                and content.get('config') == self.config:
+            self.files = content.get('files', {})
+            self.project_messages = content.get('project', [])
+            self.config_messages = content.get('config_messages', [])
+
+    def changed_files(self, files, project_files=None):
+        """
+        Finds the files that have to be analysed again: the files whose contents differ from
+        the cached version, whose imports resolve to other files, the files that import those
+        files, directly or indirectly, and the files they had duplicate code with.
+        :param: files the paths of all analysed files
+        :param: project_files the paths of all python files the analysed files can import,
+        or None if they can only import each other
+        :return: the paths of the files that have to be analysed again
+        """
+        project_files = files if project_files is None else [*files, *project_files]
+        keys = {_get_key(file): file for file in project_files}
+        self.modules_changed = keys.keys() != self.files.keys()
+        packages = {}
+        self._current = {key: {'hash': hash_file(file), 'module': get_module_name(file, packages)}
+                         for key, file in keys.items()}
+        self._modules = self._map_modules(keys)
+
+        changed = set()
+        dependents = {}
+        for key, file in keys.items():
+            current = self._current[key]
+            entry = self.files.get(key)
+            if entry is None or entry['hash'] != current['hash'] \
+                    or entry['module'] != current['module']:
+                changed.add(key)
+                current['imports'] = find_imports(file, current['module'])
+            else:
+                current['imports'] = entry['imports']
+            current['dependencies'] = sorted(
+                {dependency for name in current['imports']
+                 for dependency in self._modules.get(name, ())} - {key})
+            if entry is not None and entry['dependencies'] != current['dependencies']:
+                changed.add(key)
+            for dependency in current['dependencies']:
+                dependents.setdefault(dependency, []).append(key)
+
+        # The files of a duplicate are analysed together, so that pylint finds it again
+        for message in self.project_messages:
+            keys = [key for name in _get_referenced_modules(message)
+                    for key in self._modules.get(name, ())]
+            for key in keys:
+                dependents.setdefault(key, []).extend(keys)
+
+        # The files that import a changed file, directly or indirectly, are changed as well
+        queue = list(changed)
+        while queue:
+            for dependent in dependents.get(queue.pop(), ()):
+                if dependent not in changed:
+                    changed.add(dependent)
+                    queue.append(dependent)
+        return [file for file in files if _get_key(file) in changed]
+
+    def _map_modules(self, keys):
+        """
+        Maps every name a project file can be imported by to the file: its module name, and
+        its path relative to the analysed and the working directory.
+        :return: a dictionary from dotted module name to a list of keys
+        """
+        roots = [_get_key(self.directory), _get_key('.')]
+        modules = {}
+        for key in keys:
+            names = {self._current[key]['module']}
+            for root in roots:
+                relative = path.relpath(key, root)
+                if not relative.startswith(os.pardir):
+                    parts = relative[:-len('.py')].split(os.sep)
+                    names.add('.'.join(parts[:-1] if parts[-1] == '__init__' else parts))
+            for name in names:
+                if name:
+                    modules.setdefault(name, []).append(key)
+        return modules
+
+    def update(self, analysed, content):
+        """
+        Replaces the cached entries of the analysed files and removes the deleted files.
+        :param: analysed the paths of the files that were analysed again
+        :param: content the messages pylint reported for the analysed files
+        :raises ValueError: if a message is not about an analysed file
+        """
+        messages = {_get_key(file): [] for file in analysed}
+        config_files = {_get_key(config_file) for config_file in get_config_files()}
+        project_messages = []
+        config_messages = []
+        for message in content:
+            key = _get_key(message['path'])
+            if message['symbol'] in PROJECT_SYMBOLS:
+                project_messages.append(message)
+            elif key in messages:
+                messages[key].append(message)
+            elif key in config_files:
+                config_messages.append(message)
+            else:
+                raise ValueError(f'pylint reported a message about {message["path"]}, which '
+                                 f'is not one of the analysed files.')
+
+        for key, file_messages in messages.items():
+            self.files[key] = {
+                **self._current[key],
+                'statements': count_statements(key),
+                'messages': file_messages
+            }
+        self.files = {key: entry for key, entry in self.files.items() if path.isfile(key)}
+        if messages:
+            self.config_messages = config_messages
+        self._update_project_messages(messages.keys(), project_messages)
+
+    def _update_project_messages(self, analysed, project_messages):
+        """
+        Removes the messages about multiple modules of which a module was analysed again or
+        removed, and adds the new ones.
+        """
+        kept = []
+        for message in self.project_messages:
+            keys = [key for name in _get_referenced_modules(message)
+                    for key in self._modules.get(name, [None])]
+            if keys and all(key in self.files and key not in analysed for key in keys):
+                kept.append(message)
+        self.project_messages = kept + project_messages
+
+    def messages(self, files, last_file=None):
+        """
+        Gets the cached messages of the files, in the order of the files, followed by the
+        messages about the configuration and about multiple modules.
+        :param: files the paths of the files
+        :param: last_file the file to report the messages about multiple modules on, like
+        pylint does on the last file it analyses, or None to keep them on their own file
+        :return: the messages in the pylint JSON format
+        """
+        keys = list(dict.fromkeys(_get_key(file) for file in files))
+        if last_file is None:
+            analysed = set(keys)
+            project_messages = [message for message in self.project_messages
+                                if _get_key(message['path']) in analysed]
+        else:
+            project_messages = [self._move_message(message, last_file)
+                                for message in self.project_messages]
+        return [*(message for key in keys
+                  for message in self.files.get(key, {}).get('messages', [])),
+                *self.config_messages, *project_messages]
+
+    def _move_message(self, message, file):
+        key = _get_key(file)
+        file_messages = self.files.get(key, {}).get('messages', [])
+        # pylint strips the working directory from the paths of the files it analyses
+        prefix = path.join(os.getcwd(), '')
+        file_path = path.abspath(file)
+        return {
+            **message,
+            'module': file_messages[0]['module'] if file_messages
+            else self._current[key]['module'],
+            'path': file_path[len(prefix):] if file_path.startswith(prefix) else file_path
+        }
+
+    def statements(self, files) -> int:
+        """
+        Gets the total number of statements of the files.
+        :param: files the paths of the files
+        :return: the number of statements
+        """
+        return sum(self.files.get(_get_key(file), {}).get('statements', 0) for file in files)
+
+    def save(self):
+        """
+        Writes the cache to disk.
+        :raises OSError: if the cache cannot be written
+        """
+        write_json(self.path, {
+            'format': CACHE_FORMAT,
+            'version': self.version,
+            'config': self.config,
+            'files': self.files,
+            'project': self.project_messages,
+            'config_messages': self.config_messages
+        })
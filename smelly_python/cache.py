@@ -0,0 +1,53 @@
+"""
+The cache module provides the helpers shared by the on-disk caches of Smelly Python.
+"""
+import json
+import os
+import tempfile
+from importlib import metadata
+from pathlib import Path
+
+CACHE_DIR_ENV = 'SMELLY_PYTHON_CACHE_DIR'
+
+
+def get_cache_dir() -> Path:
+    """
+    Gets the directory in which Smelly Python stores its caches.
+    The directory can be overridden with the SMELLY_PYTHON_CACHE_DIR environment variable,
+    otherwise XDG_CACHE_HOME (or ~/.cache) is used.
+    :return: the path to the cache directory
+    """
+    if os.environ.get(CACHE_DIR_ENV):
+        return Path(os.environ[CACHE_DIR_ENV])
+    base = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(base) / 'smelly_python'
+
+
+def get_pylint_version() -> str:
+    """
+    Gets the version of the installed pylint.
+    :return: the version string, or 'unknown' if pylint is not installed
+    """
+    try:
+        return metadata.version('pylint')
+    except metadata.PackageNotFoundError:
+        return 'unknown'
+
+
+def write_json(file_path: Path, content):
+    """
+    Writes the content as JSON to a temporary file in the directory of the file, which then
+    replaces the file, so that concurrent runs never read or clobber a partially written file.
+    :param: file_path the path of the file
+    :param: content the content to write
+    :raises OSError: if the file cannot be written
+    """
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    file_descriptor, temp_path = tempfile.mkstemp(dir=file_path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(file_descriptor, 'w', encoding='utf-8') as temp_file:
+            json.dump(content, temp_file)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
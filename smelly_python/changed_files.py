@@ -0,0 +1,26 @@
+"""
+The changed files module uses git to find the python files that changed relative to a git ref.
+"""
+import subprocess
+from os import path
+
+
+def get_changed_files(directory, ref):
+    """
+    Lists the python files in the directory that were added or modified relative to the ref,
+    including changes in the working tree. Renamed files are listed as added files.
+    :param: directory the directory to search in
+    :param: ref the git ref to compare with, like origin/main
+    :return: a sorted list of paths relative to the working directory
+    :raises ValueError: if git cannot compare with the ref
+    """
+    try:
+        output = subprocess.run(['git', 'diff', '--name-only', '--no-renames',
+                                 '--diff-filter=AM', '--relative', ref, '--', directory],
+                                capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError) as error:
+        message = error.stderr.strip() if isinstance(error, subprocess.CalledProcessError) \
+            else str(error)
+        raise ValueError(f'Could not list the files changed since {ref}: {message}') from error
+    return sorted(file for file in output.splitlines()
+                  if file.endswith('.py') and path.isfile(file))
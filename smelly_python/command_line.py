@@ -1,83 +1,313 @@
 """
 The command line module provides the main function of the application.
 """
-# from asyncio import subprocess
-import subprocess
-import sys
-import json
 import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from os import path, getcwd
+from os import path
 import click
-from smelly_python.code_smell import Report
-from smelly_python.generator.pylint_explanation_fetcher import ExplanationFetcher
-from smelly_python.generator.webpage_generator import generate_webpage
-from smelly_python.generator.md_generator import generate_md
-
+from smelly_python.analysis_cache import AnalysisCache
+from smelly_python.changed_files import get_changed_files
+from smelly_python.history import ReportHistory
+from smelly_python.smell_export import export_ndjson
+from smelly_python.streaming_report import StreamingReport
+from smelly_python.timings import PhaseTimer
+from smelly_python.watcher import watch, DEFAULT_INTERVAL
+from smelly_python.pylint_runner import \
+    run_pylint, compute_grade, merge_results, PylintError, PylintResult, \
+    SHARD_BY_SIZE, SHARD_BY_COUNT
+from smelly_python.generator.explanation_cache import ExplanationCache
+from smelly_python.generator.pylint_explanation_fetcher import \
+    ExplanationFetcher, SOURCE_DOCS, SOURCE_PYLINT, DEFAULT_TIMEOUT
+from smelly_python.generator.report_archive import get_compression
+from smelly_python.generator.source_highlighter import HighlightCache
+from smelly_python.generator.webpage_generator import generate_webpage, \
+    INDEX_TABLE, INDEX_VIRTUAL, CODE_CLIENT, CODE_HIGHLIGHTED, CODE_SNIPPET
+from smelly_python.generator.md_generator import generate_md, DEFAULT_BUDGET
 
-def get_grade(text: str) -> str:
-    """
-    Extracts the grade from the text exported by pylint.
-    :param: text the exported text
-    :return: the grade with one decimal place
-    """
-    search = re.search(r'Your code has been rated at (\d+)\.?(\d*)', text)
+TIMINGS_FILE = 'timings.json'
+PROFILE_DIRECTORY = 'profile'
 
-    if search.group(2).lstrip('0') == '':
-        return search.group(1)
-
-    return search.group(1) + '.' + search.group(2)
+# The directory in the output root with the pylint output of every directory of a multi run
+TARGETS_DIRECTORY = 'targets'
 
 
 @click.command()
-@click.option('--directory', '-d', type=click.Path(exists=True),
-              help='Specify the python main directory for pylint.')
-def main(directory):
+@click.option('--directory', '-d', 'directories', type=click.Path(exists=True), multiple=True,
+              help='Specify the python main directory for pylint. Use the option multiple '
+                   'times to analyse several directories concurrently into one report.')
+@click.option('--output', '-o', type=click.Path(file_okay=False), default='report',
+              show_default=True,
+              help='The directory to write the report to, in a smelly_python subdirectory.')
+@click.option('--cache-ttl', type=click.FloatRange(min=0), default=24 * 7,
+              help='Number of hours the cached pylint explanations stay valid.')
+@click.option('--refresh-explanations', is_flag=True,
+              help='Fetch the pylint explanations again, even if they are cached.')
+@click.option('--clear-cache', is_flag=True,
+              help='Remove the cached pylint explanations, highlighted files and incremental '
+                   'analyses before running.')
+@click.option('--explanation-source', type=click.Choice([SOURCE_DOCS, SOURCE_PYLINT]),
+              default=SOURCE_DOCS,
+              help='Scrape the explanations from the pylint documentation pages, '
+                   'or build them offline from the installed pylint.')
+@click.option('--explanation-timeout', type=click.FloatRange(min=0), default=DEFAULT_TIMEOUT,
+              help='Number of seconds to wait for the pylint documentation pages.')
+@click.option('--jobs', '-j', type=click.IntRange(min=1), default=1,
+              help='Number of parallel pylint processes to split the directory over.')
+@click.option('--shard-by', type=click.Choice([SHARD_BY_SIZE, SHARD_BY_COUNT]),
+              default=SHARD_BY_SIZE,
+              help='Balance the files over the pylint processes by byte size or by count.')
+@click.option('--incremental', is_flag=True,
+              help='Only analyse the files that changed since the previous incremental run.')
+@click.option('--since', metavar='REF',
+              help='Only analyse the python files added or modified since the git ref.')
+@click.option('--in-process', is_flag=True,
+              help='Run pylint inside the smelly python process instead of a subprocess.')
+@click.option('--streaming', is_flag=True,
+              help='Read the pylint report incrementally to limit the memory usage.')
+@click.option('--workers', type=click.IntRange(min=1), default=1,
+              help='Number of processes that create the pages of the html report.')
+@click.option('--clean', is_flag=True,
+              help='Remove the html report and generate all pages again.')
+@click.option('--index-mode', type=click.Choice([INDEX_TABLE, INDEX_VIRTUAL]),
+              default=INDEX_TABLE,
+              help='Render the index as one html table, or as a virtual scrolling table that '
+                   'loads its rows from sharded data files, for very large reports.')
+@click.option('--code-mode', type=click.Choice([CODE_CLIENT, CODE_HIGHLIGHTED, CODE_SNIPPET]),
+              default=CODE_CLIENT,
+              help='Highlight the code pages in the browser, highlight them when the report is '
+                   'generated, or only show the lines around the code smells.')
+@click.option('--archive', type=click.Path(dir_okay=False, writable=True),
+              help='Write the html report into this tar archive instead of the report '
+                   'directory, compressed according to its extension, like report.tar.gz.')
+@click.option('--ndjson', type=click.Path(dir_okay=False, writable=True),
+              help='Also export all code smells to this file as newline delimited JSON.')
+@click.option('--comment-budget', type=click.IntRange(min=1), default=DEFAULT_BUDGET,
+              help='Maximum number of characters of the markdown comment; the code smells '
+                   'that do not fit are summarised by smell and by file.')
+@click.option('--timings', is_flag=True,
+              help=f'Write the wall time, CPU time and peak memory of every phase to '
+                   f'{TIMINGS_FILE} next to report.json.')
+@click.option('--profile', is_flag=True,
+              help=f'Profile the report generation phases with cProfile and save the '
+                   f'statistics in the {PROFILE_DIRECTORY} directory next to report.json.')
+@click.option('--history', type=click.Path(dir_okay=False),
+              help='Store the code smells of this run in this SQLite database, which can be '
+                   'queried with smelly-python-history.')
+@click.option('--history-label', metavar='LABEL',
+              help='The label of the run in the history, like a commit or branch name.')
+@click.option('--watch', is_flag=True,
+              help='Keep running and update the report when python files in the directory '
+                   'change, analysing only the changed files.')
+@click.option('--watch-interval', type=click.FloatRange(min=0.1), default=DEFAULT_INTERVAL,
+              help='Number of seconds between two checks for changed files when watching.')
+def main(directories, **options):
     """
     Main command line interface.
-    Takes the first command line argument to be the directory that pylint should analyse.
+    Takes the directories that pylint should analyse from the --directory options.
     """
-    if not directory:
+    cache = ExplanationCache(ttl=options['cache_ttl'] * 60 * 60)
+    if options['clear_cache']:
+        cache.clear()
+        HighlightCache().clear()
+        AnalysisCache.clear()
+        if not directories:
+            print('Cleared the explanation, highlight and analysis caches.')
+            sys.exit(0)
+    if not directories:
         print("Please provide the --dir parameter")
         sys.exit(1)
-    _setup_dirs()
-    print('Running pylint...')
-    exit_code = 0
-    try:
-        subprocess.run(['pylint', directory, f'--output-format='
-                                             f'json:{_get_reports("report.json")},'
-                                             f'text:{_get_reports("grade.txt")}'],
-                       capture_output=True, text=True, check=True)
-    except subprocess.CalledProcessError as error:
-        # Either fatal error, or usage error
-        if error.returncode == 1 or error.returncode >= 32:
-            print(f'Whoops we could not run pylint for the following directory: {directory}')
-            with open(_get_reports('grade.txt'), 'r', encoding='utf-8') as text_report:
-                print(text_report.read())
-            sys.exit(error.returncode)
-        exit_code = error.returncode
-    print('Finished running pylint, creating report...')
-    with open(_get_reports('report.json'), 'r', encoding='utf-8') as input_file:
-        content = json.load(input_file)
-    with open(_get_reports('grade.txt'), 'r', encoding='utf-8') as input_file:
-        grade = get_grade(input_file.read())
-
-    report = Report(content, grade)
-    explanations = ExplanationFetcher()
-    generate_webpage(report, explanations)
-    generate_md(report, explanations)
+    if options['watch'] and options['since'] is not None:
+        print('The --since and --watch options cannot be combined.')
+        sys.exit(1)
+    # The same directory is only analysed once
+    directories = list(dict.fromkeys(path.normpath(directory) for directory in directories))
+    if options['watch'] and len(directories) > 1:
+        print('Only one directory can be watched.')
+        sys.exit(1)
+    if options['archive']:
+        try:
+            get_compression(options['archive'])
+        except ValueError as error:
+            print(error)
+            sys.exit(1)
+    options['report_path'] = path.abspath(path.join(options['output'], 'smelly_python'))
+    _setup_dirs(options['report_path'])
+    timer = PhaseTimer(profile=options['profile'])
+    # Download the documentation pages while pylint is running
+    explanations = ExplanationFetcher(cache, refresh=options['refresh_explanations'],
+                                      source=options['explanation_source'], lazy=True,
+                                      timeout=options['explanation_timeout'])
+    if len(directories) > 1:
+        with timer.phase('pylint'):
+            result, targets = _run_targets(directories, options)
+        _generate_reports(result, explanations, timer, options, targets)
+        _write_timings(timer, options)
+        print('Success generating the report!')
+        sys.exit(result.exit_code)
 
+    directory = directories[0]
+    # When watching, pylint stays warm in this process and only changed files are analysed
+    if options['watch']:
+        options['in_process'] = True
+    analysis_cache = AnalysisCache(directory) \
+        if options['incremental'] or options['watch'] else None
+    with timer.phase('pylint'):
+        result = _run_analysis(directory, options, options['report_path'], analysis_cache)
+    _generate_reports(result, explanations, timer, options)
+    _write_timings(timer, options)
     print('Success generating the report!')
 
-    sys.exit(exit_code)
+    if options['watch']:
+        _watch(directory, explanations, analysis_cache, options)
 
+    sys.exit(result.exit_code)
+
+
+def _generate_reports(result: PylintResult, explanations: ExplanationFetcher,
+                      timer: PhaseTimer, options, targets=None):
+    with timer.phase('load_report', profile=True):
+        report = result.to_report(options['streaming'])
+    try:
+        with timer.phase('explanations', profile=True):
+            explanations.load(report.get_index().get_codes())
+        with timer.phase('generate_webpage', profile=True):
+            generate_webpage(report, explanations, options['report_path'],
+                             workers=options['workers'],
+                             clean=options['clean'], index_mode=options['index_mode'],
+                             code_mode=options['code_mode'], archive=options['archive'])
+        with timer.phase('generate_md', profile=True):
+            generate_md(report, explanations, options['report_path'],
+                        budget=options['comment_budget'], targets=targets)
+        if options['ndjson']:
+            with timer.phase('export_ndjson', profile=True):
+                export_ndjson(report, options['ndjson'])
+        if options['history']:
+            with timer.phase('history', profile=True), ReportHistory(options['history']) as history:
+                run = history.add(report, options['history_label'])
+            print(f'Stored the report as run {run} in {options["history"]}')
+    finally:
+        # A streaming report removes the code smells it spilled to disk
+        if isinstance(report, StreamingReport):
+            report.close()
+
+
+def _watch(directory, explanations: ExplanationFetcher, analysis_cache: AnalysisCache,
+           options):
+    # Only the first report is generated from scratch
+    options['clean'] = False
+
+    def on_change(changed, removed):
+        print(f'Changed python files: {len(changed)}, removed: {len(removed)}. '
+              f'Updating the report...')
+        timer = PhaseTimer(profile=options['profile'])
+        try:
+            with timer.phase('pylint'):
+                result = _run_analysis(directory, options, options['report_path'],
+                                       analysis_cache)
+        except SystemExit:
+            # The error has been printed, try again after the next change
+            return
+        _generate_reports(result, explanations, timer, options)
+        _write_timings(timer, options)
+        print(f'Updated the report, your project scored {result.grade}/10')
+
+    print(f'Watching {directory} for changes, press Ctrl+C to stop.')
+    try:
+        watch(directory, on_change, options['watch_interval'])
+    except KeyboardInterrupt:
+        print('Stopped watching.')
 
-def _setup_dirs():
-    Path(path.join('report', 'smelly_python')).mkdir(parents=True, exist_ok=True)
+
+def _write_timings(timer: PhaseTimer, options):
+    if options['timings']:
+        timings_path = path.join(options['report_path'], TIMINGS_FILE)
+        timer.write(timings_path)
+        print(f'Saved the timings to {timings_path}')
+    if options['profile']:
+        for profile_path in timer.write_profiles(
+                path.join(options['report_path'], PROFILE_DIRECTORY)):
+            print(f'Saved the profile to {profile_path}')
+
+
+def _run_targets(directories, options):
+    """
+    Analyses every directory into its own working directory in the output root, concurrently
+    unless pylint runs in process, and merges the results.
+    :return: a tuple of the merged result, and the directory, grade and number of code smells
+    of every directory
+    """
+    target_paths = _get_target_paths(directories, options['output'])
+    for target_path in target_paths:
+        _setup_dirs(target_path)
+
+    def analyse(directory, target_path):
+        analysis_cache = AnalysisCache(directory) if options['incremental'] else None
+        return _run_analysis(directory, options, target_path, analysis_cache,
+                             count_statements=True)
+
+    # pylint keeps global state, so it cannot run in several threads of one process
+    if options['in_process']:
+        results = list(map(analyse, directories, target_paths))
+    else:
+        with ThreadPoolExecutor(len(directories)) as executor:
+            results = list(executor.map(analyse, directories, target_paths))
+    targets = [(directory, result.grade, sum(1 for _ in result.iter_messages()))
+               for directory, result in zip(directories, results)]
+    return merge_results(results, path.join(options['report_path'], 'report.json')), targets
+
+
+def _get_target_paths(directories, output):
+    """
+    Gets a unique working directory in the output root for every analysed directory.
+    """
+    target_paths = []
+    for directory in directories:
+        name = re.sub(r'[^\w.-]+', '_', path.normpath(directory)).strip('._') or 'root'
+        target_path = path.abspath(path.join(output, TARGETS_DIRECTORY, name))
+        suffix = 1
+        while target_path in target_paths:
+            suffix += 1
+            target_path = path.abspath(path.join(output, TARGETS_DIRECTORY, f'{name}-{suffix}'))
+        target_paths.append(target_path)
+    return target_paths
+
+
+def _run_analysis(directory, options, report_path,  # pylint: disable=too-many-arguments
+                  analysis_cache: AnalysisCache = None, *,
+                  count_statements=False) -> PylintResult:
+    files = None
+    since = options['since']
+    if since is not None:
+        try:
+            files = get_changed_files(directory, since)
+        except ValueError as error:
+            print(error)
+            sys.exit(1)
+        if len(files) == 0:
+            print(f'No python files were changed since {since}.')
+            return PylintResult([], compute_grade([], 0), 0, statements=0)
+
+    print(f'Running pylint on {directory}...')
+    try:
+        result = run_pylint(directory, report_path, options['jobs'], options['shard_by'],
+                            cache=analysis_cache, files=files,
+                            in_process=options['in_process'],
+                            count_statements=count_statements)
+    except PylintError as error:
+        print(f'Whoops we could not run pylint for the following directory: {directory}')
+        print(error.output)
+        sys.exit(error.returncode)
+    except ValueError as error:
+        print(error)
+        sys.exit(1)
+    print(f'Finished running pylint on {directory}, creating report...')
+    return result
 
 
-def _get_reports(file_name):
-    return path.join(getcwd(), 'report', 'smelly_python', file_name)
+def _setup_dirs(report_path):
+    Path(report_path).mkdir(parents=True, exist_ok=True)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,68 @@
+"""
+Module that stores the parsed explanations of the pylint documentation on disk,
+so that a warm run does not have to download and parse the documentation pages again.
+"""
+import json
+import time
+from pathlib import Path
+
+from smelly_python.cache import get_cache_dir, get_pylint_version, write_json
+
+DEFAULT_TTL = 7 * 24 * 60 * 60
+
+
+class ExplanationCache:
+    """
+    A versioned cache of explanations, keyed by the installed pylint version.
+    Entries older than the time to live (in seconds) are ignored.
+    A cache that is not complete only contains the explanations of some codes; codes that
+    were looked up but have no explanation are stored as None.
+    """
+
+    def __init__(self, directory=None, ttl=DEFAULT_TTL, version=None):
+        self.directory = Path(directory) if directory is not None else get_cache_dir()
+        self.ttl = ttl
+        self.version = version if version is not None else get_pylint_version()
+
+    @property
+    def path(self) -> Path:
+        """
+        The path of the cache file for the current pylint version.
+        """
+        return self.directory / f'explanations-{self.version}.json'
+
+    def load(self):
+        """
+        Loads the cached explanations.
+        :return: a tuple of a dictionary from code to explanation dictionary and whether the
+        cache is complete, or None if the cache is missing, expired or unreadable
+        """
+        try:
+            with open(self.path, 'r', encoding='utf-8') as cache_file:
+                content = json.load(cache_file)
+        except (OSError, ValueError):
+            return None
+        if content.get('version') != self.version \
+                or time.time() - content.get('created', 0) > self.ttl:
+            return None
+        return content.get('explanations', {}), content.get('complete', True)
+
+    def store(self, explanations, complete=True):
+        """
+        Stores the explanations in the cache.
+        :param: explanations a dictionary from code to explanation dictionary
+        :param: complete whether the explanations of all codes are included
+        """
+        write_json(self.path, {
+            'version': self.version,
+            'created': time.time(),
+            'complete': complete,
+            'explanations': explanations
+        })
+
+    def clear(self):
+        """
+        Removes the cached explanations of all pylint versions.
+        """
+        for file in self.directory.glob('explanations-*.json'):
+            file.unlink()
@@ -7,6 +7,15 @@ from os import path
 from smelly_python.code_smell import Report
 from smelly_python.generator.pylint_explanation_fetcher import ExplanationFetcher
 
+# The maximum number of characters of a GitHub comment
+DEFAULT_BUDGET = 65536
+
+# The part of the budget kept for the summary of the code smells that do not fit in the table
+SUMMARY_SHARE = 4
+
+# The characters kept for the line that mentions the omitted summary rows
+OMITTED_RESERVE = 100
+
 
 def get_block(string):
     """
@@ -17,6 +26,27 @@ def get_block(string):
     return f'{string}\n\n'
 
 
+def get_table_row(cells):
+    """
+    Creates a row of an MD table.
+    :param: cells the cells of the row
+    :return: the row in MD format
+    """
+    return f'| {" | ".join(cells)} |\n'
+
+
+def get_table_header(headers):
+    """
+    Creates the header and the line below it of an MD table.
+    :param: headers the headers of the table
+    :return: the header in MD format
+    """
+    # fix headers to use at least one character
+    headers = [' ' if header == '' else header for header in headers]
+    return get_table_row(headers) \
+        + f'|{"|".join(["-" * (len(header) + 2) for header in headers])}|\n'
+
+
 def get_table(headers, data):
     """
     Creates an MD table from headers and data.
@@ -24,20 +54,39 @@ def get_table(headers, data):
     :data: the data to go in the table
     :return: the table in MD format
     """
-    # fix headers to use at least one character
-    headers = [' ' if header == '' else header for header in headers]
+    return ''.join([get_table_header(headers), *(get_table_row(row) for row in data)])
 
-    table = ''
-    # header
-    table += f'| {" | ".join(headers)} |\n'
-    # line
-    table += f'|{"|".join(["-" * (len(header) + 2) for header in headers])}|\n'
-    # data
-    for smell in data:
-        table += f'| {" | ".join(smell)} |\n'
 
-    # return
-    return table
+class MarkdownBuilder:
+    """
+    Builds a markdown document from parts in linear time, without exceeding a budget of
+    characters.
+    """
+
+    def __init__(self, budget=DEFAULT_BUDGET):
+        self.budget = budget
+        self.length = 0
+        self._parts = []
+
+    def add(self, string, reserve=0) -> bool:
+        """
+        Adds a string if it fits in the budget.
+        :param: string the string to add
+        :param: reserve the number of characters that have to remain available afterwards
+        :return: true if the string was added
+        """
+        if self.length + len(string) + reserve > self.budget:
+            return False
+        self._parts.append(string)
+        self.length += len(string)
+        return True
+
+    def build(self) -> str:
+        """
+        Joins the added parts.
+        :return: the markdown document
+        """
+        return ''.join(self._parts)
 
 
 def get_code_smell_number_string(number):
@@ -53,47 +102,118 @@ def get_code_smell_number_string(number):
     return str(number) + ' code smells'
 
 
+def _get_row(smell, explanations, markdown_explanations):
+    if smell.message_id not in markdown_explanations:
+        markdown_explanations[smell.message_id] = \
+            explanations.get_explanation(smell.message_id).to_markdown()
+    location = smell.location
+    return get_table_row([
+        smell.type.value,
+        f'`{location.path}`',
+        '`' + str(location.line) + (
+            ':' + str(location.column) if location.column != 0 else ''
+        ) + '`',
+        smell.get_readable_symbol(),
+        markdown_explanations[smell.message_id]
+    ])
+
+
+def _add_summary_table(builder: MarkdownBuilder, headers, counts, name):
+    """
+    Adds a table with the counts from high to low, as far as the budget allows.
+    """
+    rows = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    added = 0
+    if builder.add(get_table_header(headers), OMITTED_RESERVE):
+        for key, count in rows:
+            if not builder.add(get_table_row([*key, str(count)]), OMITTED_RESERVE):
+                break
+            added += 1
+        builder.add('\n\n')
+    omitted = len(rows) - added
+    if omitted > 0:
+        builder.add(get_block(f'> {omitted} more {name}{"s" if omitted > 1 else ""} '
+                              'not shown.'))
+
+
+def _add_code_smells(builder: MarkdownBuilder, report: Report,
+                     explanations: ExplanationFetcher):
+    """
+    Adds the table of code smells in severity order until the budget is reached, and a
+    summary of the remaining code smells by symbol and by file, counted with the index of
+    the report.
+    """
+    summary_reserve = builder.budget // SUMMARY_SHARE
+    markdown_explanations = {}
+    shown = 0
+    if builder.add(get_table_header(['', 'File', 'Lines', 'Smell', 'Explanation']),
+                   summary_reserve):
+        for smell in report.code_smells:
+            if not builder.add(_get_row(smell, explanations, markdown_explanations),
+                               summary_reserve):
+                break
+            shown += 1
+        builder.add('\n\n')
+
+    index = report.get_index()
+    omitted = index.length - shown
+    if omitted > 0:
+        symbols = {}
+        for symbol, count in index.get_counts(index.symbols, shown).items():
+            smell = index.first_smells[symbol]
+            symbols[smell.type.value, smell.get_readable_symbol()] = count
+        files = {(f'`{file}`',): count
+                 for file, count in index.get_counts(index.files, shown).items()}
+        builder.add(get_block(f'### Not shown: {get_code_smell_number_string(omitted)}'))
+        builder.add(get_block('These did not fit in the comment, see the html report for '
+                              'the details.'))
+        _add_summary_table(builder, ['', 'Smell', 'Count'], symbols, 'smell')
+        _add_summary_table(builder, ['File', 'Count'], files, 'file')
+
+
 def generate_md(report: Report, explanations: ExplanationFetcher,
-                output_path: str = path.join('report', 'smelly_python')):
+                output_path: str = path.join('report', 'smelly_python'), budget=DEFAULT_BUDGET,
+                targets=None):
     """
     Generate the MD file that will become the GitHub comment.
+    The comment never exceeds the budget of characters: the table is filled in severity order
+    until the budget is reached, after which the rest is summarised by smell and by file.
     :param: report the object holding the data to report
     :param: output_path the path to output to
+    :param: budget the maximum number of characters of the comment
+    :param: targets a list with the directory, grade and number of code smells of every
+    analysed directory, to show when more than one directory was analysed
     """
-    result = ''
+    builder = MarkdownBuilder(budget)
 
     # title
-    result += get_block(f'# Smelly Python: {report.grade}/10')
+    builder.add(get_block(f'# Smelly Python: {report.grade}/10'))
 
     # summary
-    result += get_block(
+    builder.add(get_block(
         '> Smelly Python found '
         + get_code_smell_number_string(len(report.code_smells))
         + ' in your project.'
-    )
+    ))
+
+    if targets:
+        builder.add(get_block(get_table(
+            ['Directory', 'Grade', 'Code smells'],
+            [[f'`{directory}`', f'{grade}/10', str(count)] for directory, grade, count in targets]
+        ).rstrip('\n')))
 
     if report.is_clean():
         # congratulations
-        result += get_block('Good job! :partying_face:')
+        builder.add(get_block('Good job! :partying_face:'))
 
     else:
-        result +=\
-            get_block('You can find the more detailed html report in the artifact of the action.')
-        result +=\
-            get_block('On a PR, the artifact can be found at the right top of the `Checks` tab.')
+        builder.add(
+            get_block('You can find the more detailed html report in the artifact of the action.'))
+        builder.add(
+            get_block('On a PR, the artifact can be found at the right top of the `Checks` tab.'))
         # table
-        headers = ['', 'File', 'Lines', 'Smell', 'Explanation']
-        data = [[
-            smell.type.value,
-            f'`{smell.location.path}`',
-            '`' + str(smell.location.line) + (
-                ':' + str(smell.location.column) if smell.location.column != 0 else ''
-            ) + '`',
-            smell.get_readable_symbol(),
-            explanations.get_explanation(smell.message_id).to_markdown()
-        ] for smell in report.code_smells]
-        result += get_block(get_table(headers, data))
+        _add_code_smells(builder, report, explanations)
 
     # export
     with open(path.join(output_path, 'comment.md'), 'w', encoding='utf-8') as index:
-        index.write(result)
+        index.write(builder.build())
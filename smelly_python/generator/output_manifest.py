@@ -0,0 +1,118 @@
+"""
+The output manifest module keeps track of the hashes of the inputs of every generated page,
+so that the report generators only rewrite pages whose inputs changed.
+"""
+import hashlib
+import json
+import os
+import shutil
+from os import path
+
+MANIFEST_FILE = 'manifest.json'
+
+# Increase when the generated markup changes, so that all pages are generated again
+GENERATOR_VERSION = 2
+
+
+def hash_inputs(*parts) -> str:
+    """
+    Hashes the inputs of a page.
+    :param: parts strings or bytes that the page is generated from
+    :return: the hex digest of the inputs
+    """
+    digest = hashlib.sha256(str(GENERATOR_VERSION).encode('utf-8'))
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else part.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def open_page(output_path, page):
+    """
+    Opens a page of an output directory for writing, creating its directory if needed.
+    :param: output_path the output directory
+    :param: page the path of the page, relative to the output directory
+    :return: the opened text file
+    """
+    page_path = path.join(output_path, page)
+    os.makedirs(path.dirname(page_path), exist_ok=True)
+    return open(page_path, 'w', encoding='utf-8')
+
+
+class OutputManifest:
+    """
+    The manifest of an output directory, containing the hash of the inputs of every page and
+    the checksum of every static asset that was written to it.
+    Pages that are not recorded during a run are stale and removed when the run finishes.
+    """
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.previous = {'pages': {}, 'assets': {}}
+        self.current = {'pages': {}, 'assets': {}}
+        try:
+            with open(path.join(output_path, MANIFEST_FILE), 'r', encoding='utf-8') as file:
+                self.previous = json.load(file)
+        except (OSError, ValueError):
+            pass
+
+    def is_changed(self, page, digest) -> bool:
+        """
+        Records the hash of the inputs of a page and checks whether the page has to be
+        generated again.
+        :param: page the path of the page, relative to the output directory
+        :param: digest the hash of the inputs of the page
+        :return: true if the inputs changed or the page does not exist
+        """
+        page = str(page)
+        self.current['pages'][page] = digest
+        return self.previous['pages'].get(page) != digest \
+            or not path.exists(path.join(self.output_path, page))
+
+    def open(self, page):
+        """
+        Opens a page of the output directory for writing.
+        :param: page the path of the page, relative to the output directory
+        :return: the opened text file
+        """
+        return open_page(self.output_path, page)
+
+    def copy_asset(self, source):
+        """
+        Copies a static asset to the output directory, unless an identical copy is already
+        present.
+        :param: source the path of the asset
+        """
+        name = path.basename(source)
+        with open(source, 'rb') as file:
+            checksum = hashlib.sha256(file.read()).hexdigest()
+        self.current['assets'][name] = checksum
+        if self.previous['assets'].get(name) != checksum \
+                or not path.exists(path.join(self.output_path, name)):
+            shutil.copy(source, self.output_path)
+
+    def abort(self):
+        """
+        Stops writing the report after an error. The stale pages are not removed and the
+        previous manifest is kept, so that the pages written so far are checked again by the
+        next run.
+        """
+
+    def finish(self):
+        """
+        Removes the stale pages and writes the manifest.
+        """
+        for page in self.previous['pages'].keys() - self.current['pages'].keys():
+            page_path = path.join(self.output_path, page)
+            if path.exists(page_path):
+                os.remove(page_path)
+            # Remove the directories that became empty
+            directory = path.dirname(page_path)
+            while path.normpath(directory) != path.normpath(self.output_path) \
+                    and path.isdir(directory) and not os.listdir(directory):
+                os.rmdir(directory)
+                directory = path.dirname(directory)
+
+        temp_path = path.join(self.output_path, MANIFEST_FILE + '.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(self.current, file)
+        os.replace(temp_path, path.join(self.output_path, MANIFEST_FILE))
@@ -1,12 +1,43 @@
 """
-Module to scrape the documentation of code smells from the documentation pages of pylint.
+Module to scrape the documentation of code smells from the documentation pages of pylint,
+or to build it from the message definitions of the installed pylint.
 """
+import html
+import pkgutil
 import re
+import threading
+import time
+from bisect import bisect_right
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 import requests
 from bs4 import BeautifulSoup
 from dominate.tags import a
 from dominate.util import raw
-from requests import ConnectionError as RequestError
+from requests import RequestException as RequestError
+from requests.adapters import HTTPAdapter
+
+from smelly_python.generator.explanation_cache import ExplanationCache
+
+SOURCE_DOCS = 'docs'
+SOURCE_PYLINT = 'pylint'
+
+DEFAULT_TIMEOUT = 30
+
+MESSAGE_DOCUMENTATION_URL = 'https://pylint.readthedocs.io/en/latest/user_guide/messages'
+MESSAGE_CATEGORIES = {
+    'C': 'convention',
+    'R': 'refactor',
+    'W': 'warning',
+    'E': 'error',
+    'F': 'fatal',
+    'I': 'information'
+}
+
+# The sections and the explanation headers of a documentation page, which are found without
+# parsing the whole page
+_SECTION = re.compile(r'<section\b[^>]*\bid="([^"]*)"')
+_HEADER = re.compile(r'<dt\b[^>]*\bclass="[^"]*\bfield-(?:odd|even)\b[^"]*"[^>]*>.*?</dt>',
+                     re.DOTALL)
 
 
 class Explanation:
@@ -27,9 +58,43 @@ class Explanation:
         # Remove message itself from the explanation
         next(explanation.children).extract()
         self.code = code
-        self.html = explanation.contents
+        self.html = [str(tag) for tag in explanation.contents]
         self.url = f'{doc_url}#{header.find_previous("section").attrs["id"]}'
 
+    @staticmethod
+    def from_dict(code, data):
+        """
+        Creates an Explanation from a dictionary created by to_dict.
+        :param: code the code of the explanation
+        :param: data the dictionary with the html and the url
+        :return: the explanation
+        """
+        explanation = Explanation()
+        explanation.code = code
+        explanation.html = data['html']
+        explanation.url = data['url']
+        return explanation
+
+    @staticmethod
+    def from_message_definition(definition):
+        """
+        Creates an Explanation from a message definition of the pylint message store.
+        :param: definition the pylint MessageDefinition
+        :return: the explanation
+        """
+        category = MESSAGE_CATEGORIES.get(definition.msgid[0], 'information')
+        return Explanation.from_dict(definition.msgid, {
+            'html': [html.escape(definition.description, quote=False)],
+            'url': f'{MESSAGE_DOCUMENTATION_URL}/{category}/{definition.symbol}.html'
+        })
+
+    def to_dict(self):
+        """
+        Converts this Explanation to a dictionary that can be stored as JSON.
+        :return: a dictionary with the html and the url
+        """
+        return {'html': self.html, 'url': self.url}
+
     def to_html(self):
         """
         Converts this Explanation to a list of Dominate html elements
@@ -51,7 +116,14 @@ class Explanation:
 
 class ExplanationFetcher:
     """
-    Fetches all explanations from the known documentation pages.
+    Fetches all explanations from the known documentation pages, or, if the source is
+    SOURCE_PYLINT, from the message store of the installed pylint and its extensions.
+    When scraping the documentation and a cache is given, the explanations are loaded from it
+    when possible, and stored in it after they have been fetched.
+    Refresh forces the documentation pages to be fetched again.
+    A lazy fetcher only starts downloading the documentation pages in the background if
+    nothing is cached; the explanations are parsed once load is called, optionally limited to
+    the given codes, and the pages are only downloaded then if the cache does not have them.
     """
 
     DOCUMENTATION_URLS = [
@@ -59,19 +131,123 @@ class ExplanationFetcher:
         'https://pylint.pycqa.org/en/latest/user_guide/checkers/extensions.html'
     ]
 
-    def __init__(self):
+    def __init__(self, cache: ExplanationCache = None, refresh=False, *,  # pylint: disable=too-many-arguments
+                 source=SOURCE_DOCS, plugins=(), lazy=False, timeout=DEFAULT_TIMEOUT):
         self.explanations = {}
+        self.source = source
+        self.cache = cache
+        self.refresh = refresh
+        self.timeout = timeout
+        self._pages = None
+        self._deadline = None
+
+        if source == SOURCE_PYLINT:
+            self._load_message_definitions(plugins)
+            return
+
+        if lazy:
+            self.prefetch()
+        else:
+            self.load()
+
+    def prefetch(self):
+        """
+        Starts downloading the documentation pages concurrently in the background,
+        unless the cache contains explanations. Whether a cache with the explanations of
+        only some codes is enough is decided by load.
+        """
+        if self.cache is not None and not self.refresh and self.cache.load() is not None:
+            return
+        self._download_pages()
 
+    def _download_pages(self):
+        if self._pages is not None:
+            return
+        self._deadline = time.monotonic() + self.timeout
+        session = requests.Session()
+        session.mount('https://', HTTPAdapter(pool_maxsize=len(self.DOCUMENTATION_URLS)))
+        self._pages = [(url, self._download_page(session, url))
+                       for url in self.DOCUMENTATION_URLS]
+
+    def _download_page(self, session, url) -> Future:
+        # A daemon thread does not keep the process alive when the documentation host does
+        # not respond, the timeout only applies to every single socket operation
+        page = Future()
+
+        def download():
+            try:
+                page.set_result(self._fetch_page(session, url, self.timeout))
+            except Exception as error:  # pylint: disable=broad-except
+                page.set_exception(error)
+
+        threading.Thread(target=download, daemon=True).start()
+        return page
+
+    def load(self, codes=None):
+        """
+        Loads the explanations, from the cache if possible and from the documentation pages
+        otherwise. Waits for the documentation pages at most until the timeout has passed.
+        :param: codes the codes to load the explanations of, or None to load all of them
+        """
+        if self.source == SOURCE_PYLINT:
+            return
+        codes = set(codes) if codes is not None else None
+        cached = self.cache.load() if self.cache is not None and not self.refresh else None
+        if cached is not None and (cached[1] or (codes is not None and codes <= cached[0].keys())):
+            self.explanations = {code: Explanation.from_dict(code, data)
+                                 for code, data in cached[0].items() if data is not None}
+            return
+
+        self._download_pages()
+        self._fetch_explanations(codes)
+
+        if self.cache is not None and self.has_explanations():
+            if codes is None:
+                self._store({code: explanation.to_dict()
+                             for code, explanation in self.explanations.items()}, True)
+            else:
+                previous = cached[0] if cached is not None else {}
+                self._store({**previous, **{
+                    code: self.explanations[code].to_dict() if code in self.explanations
+                    else None for code in codes
+                }}, False)
+
+    def _store(self, explanations, complete):
+        try:
+            self.cache.store(explanations, complete)
+        except OSError:
+            print('Could not write the explanation cache.')
+
+    def _load_message_definitions(self, plugins):
         try:
-            explanation_headers = [(header, url) for url in self.DOCUMENTATION_URLS for header in
-                                   ExplanationFetcher._fetch_explanation_headers(url)]
-            for header, url in explanation_headers:
-                try:
-                    explanation = Explanation(header, url)
-                    self.explanations[explanation.code] = explanation
-                except ValueError:
-                    continue
-        except RequestError:
+            # pylint: disable=import-outside-toplevel
+            import pylint.extensions
+            from pylint.lint import PyLinter
+        except ImportError:
+            print('Could not import pylint. No additional explanations will be shown.')
+            return
+
+        linter = PyLinter()
+        linter.load_default_plugins()
+        linter.load_plugin_modules([
+            f'pylint.extensions.{module.name}'
+            for module in pkgutil.iter_modules(pylint.extensions.__path__)
+            if not module.name.startswith('_')
+        ] + list(plugins))
+        self.explanations = {definition.msgid: Explanation.from_message_definition(definition)
+                             for definition in linter.msgs_store.messages}
+
+    def _fetch_explanations(self, codes):
+        try:
+            for url, page in self._pages:
+                content = page.result(timeout=max(0.0, self._deadline - time.monotonic()))
+                for header in ExplanationFetcher._parse_explanation_headers(content, codes):
+                    try:
+                        explanation = Explanation(header, url)
+                        self.explanations[explanation.code] = explanation
+                    except ValueError:
+                        continue
+        except (RequestError, FutureTimeoutError):
             print('Could not load the documentation page. '
                   'No additional explanations will be shown.')
             self.explanations = {}
@@ -96,8 +272,33 @@ class ExplanationFetcher:
         return len(self.explanations) != 0
 
     @staticmethod
-    def _fetch_explanation_headers(url):
-        res = requests.get(url)
-        soup = BeautifulSoup(res.content, features='html.parser')
-        return [*soup.findAll('dt', {'class': 'field-even'}),
-                *soup.findAll('dt', {'class': 'field-odd'})]
+    def _fetch_page(session, url, timeout):
+        return session.get(url, timeout=timeout).content
+
+    @staticmethod
+    def _parse_explanation_headers(content, codes=None):
+        """
+        Finds the headers of the explanations in a documentation page. Only the headers of
+        the codes are parsed, each with its explanation and in the section it belongs to;
+        the rest of the page is only scanned.
+        :param: content the documentation page
+        :param: codes the codes to find the headers of, or None for all headers
+        :return: a list of BeautifulSoup dt tags
+        """
+        text = content.decode('utf-8', errors='replace') if isinstance(content, bytes) \
+            else content
+        sections = [(match.start(), match.group(1)) for match in _SECTION.finditer(text)]
+        positions = [position for position, _ in sections]
+        headers = []
+        for match in _HEADER.finditer(text):
+            code = re.search(r'\(([A-Z]\d+)\)', match.group(0))
+            if codes is not None and (code is None or code.group(1) not in codes):
+                continue
+            end = text.find('</dd>', match.end())
+            section = bisect_right(positions, match.start()) - 1
+            if end < 0 or section < 0:
+                continue
+            fragment = f'<section id="{sections[section][1]}">' \
+                       f'{text[match.start():end + len("</dd>")]}</section>'
+            headers.append(BeautifulSoup(fragment, features='html.parser').find('dt'))
+        return headers
@@ -0,0 +1,137 @@
+"""
+The report archive module writes the html report into a single compressed tar archive, entry
+by entry, without writing the pages to the output directory first.
+"""
+import hashlib
+import io
+import os
+import tarfile
+import tempfile
+import time
+from contextlib import contextmanager
+from os import path
+
+# The top level directory of the archive, like the html report directory
+ARCHIVE_DIRECTORY = 'smelly_python'
+
+# The compression level of gzip and bzip2, the default of 9 is several times slower for a
+# few percent smaller reports
+COMPRESS_LEVEL = 6
+
+_COMPRESSIONS = {
+    '.tar': '',
+    '.tar.gz': 'gz',
+    '.tgz': 'gz',
+    '.tar.bz2': 'bz2',
+    '.tar.xz': 'xz',
+    '.txz': 'xz'
+}
+
+
+def get_compression(archive_path) -> str:
+    """
+    Gets the compression of an archive from its file name.
+    :param: archive_path the path of the archive
+    :return: the compression that tarfile uses for the extension, '' for no compression
+    :raises ValueError: if the extension is not a tar archive extension
+    """
+    for extension, compression in _COMPRESSIONS.items():
+        if archive_path.endswith(extension):
+            return compression
+    raise ValueError(f'Cannot create an archive named {path.basename(archive_path)}, use one '
+                     f'of the extensions {", ".join(_COMPRESSIONS)}.')
+
+
+class ReportArchive:
+    """
+    A tar archive of the html report, which can be used in place of the OutputManifest of an
+    output directory. As the archive is always created from scratch, every page is changed.
+    Entries with the same content as an earlier entry, like the shared assets and identical
+    pages, are stored once and added as hard links to that entry. Content that repeats
+    within and between entries is removed by the compression.
+    """
+
+    def __init__(self, archive_path):
+        compression = get_compression(archive_path)
+        options = {'compresslevel': COMPRESS_LEVEL} if compression in ('gz', 'bz2') else {}
+        # pylint: disable=consider-using-with
+        self._tar = tarfile.open(archive_path, f'w:{compression}', **options)
+        self._path = archive_path
+        self._mtime = time.time()
+        self._entries = {}
+        self.links = 0
+
+    @staticmethod
+    def is_changed(_page, _digest) -> bool:
+        """
+        Checks whether a page has to be generated, which is always the case in an archive.
+        :return: true
+        """
+        return True
+
+    @contextmanager
+    def open(self, page):
+        """
+        Opens a page for writing. The page is written to a temporary file, as the size of an
+        entry has to be known before its content, and added to the archive at the end of the
+        with block.
+        :param: page the path of the page in the report
+        :return: a context manager of the text file to write to
+        """
+        with tempfile.TemporaryFile() as buffer:
+            text = io.TextIOWrapper(buffer, encoding='utf-8', newline='')
+            yield text
+            text.flush()
+            text.detach()
+            self._add(str(page), buffer)
+
+    def add(self, page, content: str):
+        """
+        Adds a page that was already generated.
+        :param: page the path of the page in the report
+        :param: content the content of the page
+        """
+        self._add(str(page), io.BytesIO(content.encode('utf-8')))
+
+    def copy_asset(self, source):
+        """
+        Adds a static asset to the root of the report.
+        :param: source the path of the asset
+        """
+        with open(source, 'rb') as file:
+            self._add(path.basename(source), file)
+
+    def _add(self, page, file):
+        digest = hashlib.sha256()
+        file.seek(0)
+        for chunk in iter(lambda: file.read(1 << 16), b''):
+            digest.update(chunk)
+        info = tarfile.TarInfo(f'{ARCHIVE_DIRECTORY}/{page}')
+        info.mtime = self._mtime
+        info.mode = 0o644
+        target = self._entries.get(digest.digest())
+        if target is not None:
+            info.type = tarfile.LNKTYPE
+            info.linkname = target
+            self._tar.addfile(info)
+            self.links += 1
+            return
+        self._entries[digest.digest()] = info.name
+        info.size = file.tell()
+        file.seek(0)
+        self._tar.addfile(info, file)
+
+    def finish(self):
+        """
+        Writes the end of the archive and closes it.
+        """
+        self._tar.close()
+
+    def abort(self):
+        """
+        Closes the archive and removes it, as the report could not be generated completely.
+        """
+        try:
+            self._tar.close()
+        finally:
+            os.remove(self._path)
@@ -0,0 +1,120 @@
+"""
+The source highlighter module highlights python source files at generation time, line by line,
+and caches the highlighted lines on disk per file content hash.
+Pygments is optional: without it the lines are only escaped.
+"""
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from dominate.util import escape
+
+from smelly_python.cache import get_cache_dir
+
+try:
+    import pygments
+    from pygments.formatters.html import HtmlFormatter
+    from pygments.lexers.python import PythonLexer
+    from pygments.token import STANDARD_TYPES
+except ImportError:
+    pygments = None
+
+# The class of the element that contains the highlighted lines
+HIGHLIGHT_CLASS = 'highlight'
+
+# Increase when the highlighted markup changes, so that the cached lines are ignored
+HIGHLIGHTER_VERSION = 1
+
+
+def get_highlighter() -> str:
+    """
+    Gets the name of the highlighter that is used, which is part of the cache key.
+    :return: the pygments version, or 'plain' if pygments is not installed
+    """
+    return f'pygments-{pygments.__version__}' if pygments is not None else 'plain'
+
+
+def get_style_definitions() -> str:
+    """
+    Gets the CSS rules of the highlighted tokens.
+    :return: the CSS, which is empty if pygments is not installed
+    """
+    if pygments is None:
+        return ''
+    return HtmlFormatter().get_style_defs(f'.{HIGHLIGHT_CLASS}')
+
+
+def _get_css_class(token_type):
+    while token_type not in STANDARD_TYPES:
+        token_type = token_type.parent
+    return STANDARD_TYPES[token_type]
+
+
+def highlight_lines(source):
+    """
+    Highlights the source code.
+    Tokens that span multiple lines, like docstrings, are split per line.
+    :param: source the python source code
+    :return: a list with the html of every line
+    """
+    # A final newline ends the last line instead of starting a new one
+    if source.endswith('\n'):
+        source = source[:-1]
+    if pygments is None:
+        return [escape(line) for line in source.split('\n')]
+
+    lines = [[]]
+    lexer = PythonLexer(stripnl=False, ensurenl=False)
+    for token_type, value in pygments.lex(source, lexer):
+        css_class = _get_css_class(token_type)
+        for index, part in enumerate(value.split('\n')):
+            if index > 0:
+                lines.append([])
+            if part:
+                lines[-1].append(f'<span class="{css_class}">{escape(part)}</span>'
+                                 if css_class else escape(part))
+    return [''.join(line) for line in lines]
+
+
+class HighlightCache:
+    """
+    A cache of highlighted source files, keyed by the hash of their contents and the
+    highlighter that was used.
+    """
+
+    def __init__(self, cache_dir=None):
+        cache_dir = Path(cache_dir) if cache_dir is not None else get_cache_dir()
+        self.directory = cache_dir / 'highlight'
+        self.prefix = f'{HIGHLIGHTER_VERSION}-{get_highlighter()}'
+
+    def get_lines(self, source):
+        """
+        Gets the highlighted lines of the source code, highlighting it if it is not cached.
+        :param: source the python source code
+        :return: a list with the html of every line
+        """
+        digest = hashlib.sha256(f'{self.prefix}\n{source}'.encode('utf-8')).hexdigest()
+        cache_path = self.directory / f'{digest}.json'
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as cache_file:
+                return json.load(cache_file)
+        except (OSError, ValueError):
+            pass
+
+        lines = highlight_lines(source)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Pages are created by multiple processes, so every writer uses its own temporary file
+        file_descriptor, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(file_descriptor, 'w', encoding='utf-8') as cache_file:
+            json.dump(lines, cache_file)
+        os.replace(temp_path, cache_path)
+        return lines
+
+    def clear(self):
+        """
+        Removes all highlighted files from the cache.
+        """
+        for file in self.directory.glob('*.json'):
+            file.unlink()
@@ -0,0 +1,155 @@
+"""
+The streaming writer module writes the large parts of the report pages straight to the output
+file, instead of building them as dominate elements and rendering the page as one string.
+The rest of a page is still built with dominate, so the markup is identical.
+"""
+from dominate.tags import td
+from dominate.util import escape
+
+from smelly_python.code_smell import Priority
+
+# The text that marks where the streamed content goes in the rendered dominate document
+MARKER = '%%smelly-python-streamed-content%%'
+
+INDENT = '  '
+CHUNK_SIZE = 1 << 16
+
+# The number of lines shown before and after every code smell in a snippet
+SNIPPET_CONTEXT = 5
+
+ICONS = {
+    Priority.ERROR: ('error', 'error.svg'),
+    Priority.WARNING: ('warning', 'warning.svg')
+}
+DEFAULT_IMAGE = '<image alt="info" src="info.svg"></image>'
+
+
+def write_document(doc, output_file, write_content):
+    """
+    Renders the dominate document, which contains the MARKER text once, and writes it to the
+    file. The marker is replaced by the content that write_content writes.
+    :param: doc the dominate document
+    :param: output_file the file to write to
+    :param: write_content a function that gets the file and the indentation of the line
+    with the marker, and writes the content
+    """
+    before, after = str(doc).split(MARKER)
+    output_file.write(before)
+    line = before[before.rfind('\n') + 1:]
+    write_content(output_file, line[:len(line) - len(line.lstrip())])
+    output_file.write(after)
+
+
+def write_source(source_path, output_file):
+    """
+    Writes the escaped contents of a source file in chunks.
+    :param: source_path the path of the source file
+    :param: output_file the file to write to
+    """
+    with open(source_path, 'r', encoding='utf-8') as source_file:
+        while True:
+            chunk = source_file.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            output_file.write(escape(chunk))
+
+
+def get_snippet_windows(code_smells, line_count, context=SNIPPET_CONTEXT):
+    """
+    Gets the ranges of lines around the code smells, merging the ranges that overlap or touch.
+    :param: code_smells the code smells of a file
+    :param: line_count the number of lines of the file
+    :param: context the number of lines to show before and after a code smell
+    :return: a sorted list of (first line, last line) tuples, both inclusive
+    """
+    windows = []
+    for line in sorted({smell.location.line or 1 for smell in code_smells}):
+        start = min(max(1, line - context), line_count)
+        end = min(line + context, line_count)
+        if windows and start <= windows[-1][1] + 1:
+            windows[-1] = (windows[-1][0], max(windows[-1][1], end))
+        else:
+            windows.append((start, end))
+    return windows
+
+
+def _write_gap(start, end, output_file):
+    output_file.write(f'<tr class="gap" data-start="{start}" data-end="{end}">'
+                      f'<td colspan="2">Show lines {start}-{end}</td></tr>')
+
+
+def write_code_rows(lines, windows, output_file):
+    """
+    Writes a table row for every line in the windows, and a row that loads the hidden lines
+    for every gap between them.
+    :param: lines the html of every line of the file
+    :param: windows a sorted list of (first line, last line) tuples to write
+    :param: output_file the file to write to
+    """
+    output_file.write('<table class="hljs-ln"><tbody>')
+    next_line = 1
+    for start, end in windows:
+        if start > next_line:
+            _write_gap(next_line, start - 1, output_file)
+        for line in range(start, end + 1):
+            output_file.write(f'<tr id="line-{line}" data-line="{line}">'
+                              f'<td class="hljs-ln-numbers">{line}</td>'
+                              f'<td class="hljs-ln-code">{lines[line - 1]}</td></tr>')
+        next_line = end + 1
+    if next_line <= len(lines):
+        _write_gap(next_line, len(lines), output_file)
+    output_file.write('</tbody></table>')
+
+
+def _render_explanation_cell(explanation, indent):
+    cell = td(*explanation.to_html(), _class='explanation')
+    # Render at the indentation level of a cell, like dominate does inside the document
+    # pylint: disable=protected-access
+    return ''.join(cell._render([], len(indent) // len(INDENT), INDENT, True, False))
+
+
+def write_rows(code_smells, explanations, get_html_path, output_file, indent):
+    """
+    Writes a row of the code smell table of the index page for every code smell, with the
+    same markup dominate generates. The explanation cells are rendered once per code, and
+    the links to the pages once per file.
+    :param: code_smells the code smells to write
+    :param: explanations the explanations of the code smells
+    :param: get_html_path the function that gives the html page of a file
+    :param: output_file the file to write to
+    :param: indent the indentation of the table body
+    """
+    row_indent = indent + INDENT
+    cell_indent = row_indent + INDENT
+    content_indent = cell_indent + INDENT
+    explanation_cells = {}
+    html_paths = {}
+    images = {priority: f'<image alt="{alt}" src="{icon}"></image>'
+              for priority, (alt, icon) in ICONS.items()}
+    for smell in code_smells:
+        if smell.message_id not in explanation_cells:
+            explanation_cells[smell.message_id] = _render_explanation_cell(
+                explanations.get_explanation(smell.message_id), cell_indent)
+        location = smell.location
+        if location.path not in html_paths:
+            html_paths[location.path] = escape(str(get_html_path(location.path)))
+        html_path = html_paths[location.path]
+        line = location.line
+        output_file.write(
+            f'\n{row_indent}<tr class="center-text">'
+            f'\n{cell_indent}<td>'
+            f'\n{content_indent}{images.get(smell.type, DEFAULT_IMAGE)}'
+            f'\n{cell_indent}</td>'
+            f'\n{cell_indent}<td>'
+            f'\n{content_indent}<a href="{html_path}">{escape(location.path)}</a>'
+            f'\n{cell_indent}</td>'
+            f'\n{cell_indent}<td>{escape(smell.symbol)}</td>'
+            f'\n{cell_indent}<td>{escape(smell.message)}</td>'
+            f'\n{cell_indent}<td>'
+            f'\n{content_indent}<a href="{html_path}#line-{line - 3 if line > 3 else line}">'
+            f'{line}:{location.column}</a>'
+            f'\n{cell_indent}</td>'
+            f'\n{cell_indent}{explanation_cells[smell.message_id]}'
+            f'\n{row_indent}</tr>'
+        )
+    output_file.write(f'\n{indent}')
@@ -0,0 +1,105 @@
+"""
+The virtual index module generates an index page for very large reports. The code smells are
+written to sharded data files, which the virtual scrolling table in script.js loads, sorts
+and filters in the browser, so only the visible rows are ever rendered.
+"""
+import json
+
+from dominate.tags import div, table, tr, thead, th, script, input_, select, option
+from dominate.util import raw
+
+from smelly_python.code_smell import Report
+from smelly_python.generator.output_manifest import OutputManifest, hash_inputs
+from smelly_python.generator.pylint_explanation_fetcher import ExplanationFetcher
+
+SHARD_SIZE = 1000
+DATA_DIRECTORY = 'data'
+
+
+def _get_row(smell, html_path):
+    """
+    Converts a code smell to the row format that script.js expects.
+    """
+    location = smell.location
+    return [smell.severity(), smell.type.name.lower(), location.path, html_path, smell.symbol,
+            smell.message, location.line, location.column, smell.message_id]
+
+
+def _write_data_file(name, content, manifest: OutputManifest):
+    page = f'{DATA_DIRECTORY}/{name}'
+    if manifest.is_changed(page, hash_inputs(content)):
+        with manifest.open(page) as data_file:
+            data_file.write(content)
+
+
+def _write_shards(report: Report, manifest: OutputManifest, get_html_path):
+    """
+    Writes the rows of the code smells in shards of SHARD_SIZE rows.
+    :return: the number of shards
+    """
+    shards = 0
+    rows = []
+    html_paths = {}
+    for smell in report.code_smells:
+        if smell.location.path not in html_paths:
+            html_paths[smell.location.path] = str(get_html_path(smell.location.path))
+        rows.append(_get_row(smell, html_paths[smell.location.path]))
+        if len(rows) == SHARD_SIZE:
+            _write_data_file(f'smells-{shards:05d}.js', f'addSmellRows({json.dumps(rows)});',
+                             manifest)
+            shards += 1
+            rows = []
+    if rows:
+        _write_data_file(f'smells-{shards:05d}.js', f'addSmellRows({json.dumps(rows)});',
+                         manifest)
+        shards += 1
+    return shards
+
+
+def write_index_data(report: Report, explanations: ExplanationFetcher,
+                     manifest: OutputManifest, get_html_path):
+    """
+    Writes the data files of the virtual scrolling table: the rows of the code smells in
+    shards, and the explanations of their codes.
+    :param: report the report to show
+    :param: explanations the explanations of the code smells
+    :param: manifest the manifest of the output directory, or the archive
+    :param: get_html_path the function that gives the html page of a file
+    :return: the number of shards
+    """
+    shards = _write_shards(report, manifest, get_html_path)
+    # Look the explanations up directly, as get_explanation warns about unsupported codes
+    explanation_html = {
+        code: ''.join(str(tag) for tag in explanations.explanations[code].to_html())
+        for code in sorted(report.get_index().get_codes()) if code in explanations.explanations
+    }
+    _write_data_file('explanations.js', f'setExplanations({json.dumps(explanation_html)});',
+                     manifest)
+    return shards
+
+
+def add_virtual_table(shards):
+    """
+    Adds the filters and the virtual scrolling table to the current dominate element.
+    :param: shards the number of shards with rows
+    """
+    with div(_class='virtual-filters'):
+        input_(type='search', id='smell-filter', placeholder='Filter code smells')
+        with select(id='severity-filter'):
+            option('All severities', value='')
+            for severity in ['error', 'warning', 'refactor', 'convention']:
+                option(severity, value=severity)
+        div(id='smell-count')
+    with table(_class='smells_table virtual-header'):
+        with thead():
+            with tr():
+                for column, name in [('severity', 'Severity'), ('path', 'File'),
+                                     ('symbol', 'Code smell'), ('message', 'Message'),
+                                     ('line', 'Location'), ('explanation', 'Explanation')]:
+                    th(name, data_sort=column)
+    with div(id='virtual-table', _class='virtual-table'):
+        div(id='virtual-spacer')
+        table(_class='smells_table', id='virtual-rows')
+    script(src=f'{DATA_DIRECTORY}/explanations.js', defer=True)
+    script(raw(f'window.addEventListener("load", '
+               f'() => loadSmellShards("{DATA_DIRECTORY}", {shards}));'))
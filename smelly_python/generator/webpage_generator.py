@@ -2,29 +2,62 @@
 The webpage generator module provides the method that generates the webpage given a list of
 style errors.
 """
+import io
+import json
 import os
 import shutil
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from itertools import islice
 from pathlib import Path
 from os import path, getcwd
 
 from dominate import document
-from dominate.svg import image
 from dominate.tags import \
-    h1, div, tbody, table, tr, td, thead, th, \
-    a, footer, script, pre, code, link, h4, p
-from dominate.util import raw
+    h1, div, tbody, table, tr, thead, th, \
+    a, footer, script, pre, code, link, h4, p, span, ul, li
+from dominate.util import raw, text
 
-from smelly_python.code_smell import CodeSmell, Priority, Report
+from smelly_python.code_smell import CodeSmell, Report, Priority
+from smelly_python.report_index import ReportIndex
+from smelly_python.smell_export import jsonify_code_smells, write_ndjson
+from smelly_python.generator.output_manifest import OutputManifest, hash_inputs, open_page
 from smelly_python.generator.pylint_explanation_fetcher import ExplanationFetcher
+from smelly_python.generator.report_archive import ReportArchive
+from smelly_python.generator.source_highlighter import \
+    HighlightCache, HIGHLIGHT_CLASS, get_style_definitions
+from smelly_python.generator.streaming_writer import MARKER, write_document, write_rows, \
+    write_source, write_code_rows, get_snippet_windows
+from smelly_python.generator.virtual_index import write_index_data, add_virtual_table
 
+INDEX_TABLE = 'table'
+INDEX_VIRTUAL = 'virtual'
 
-def _create_output(output_dir):
-    if path.exists(output_dir):
+CODE_CLIENT = 'client'
+CODE_HIGHLIGHTED = 'highlighted'
+CODE_SNIPPET = 'snippet'
+
+HIGHLIGHT_STYLESHEET = 'highlight.css'
+
+# The number of files with the most code smells in the summary of the index
+SUMMARY_FILES = 10
+
+# The file with all code smells in an archive
+SMELLS_FILE = 'smells.ndjson'
+
+# The number of files whose pages a worker process creates at once
+CHUNK_FILES = 16
+
+
+def _create_output(output_dir, clean=False):
+    if clean and path.exists(output_dir):
         shutil.rmtree(output_dir)
-    os.mkdir(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
 
 
-def _generate_code_document(file: [CodeSmell]):
+def _generate_code_document(file: [CodeSmell], code_mode=CODE_CLIENT):
     doc = document(title='Smelly Python code smell report')
 
     # Count number of nested folders by counting /
@@ -32,24 +65,35 @@ def _generate_code_document(file: [CodeSmell]):
 
     with doc.head:
         link(rel='stylesheet', href=f'{link_to_home}style.css')
-        link(rel='stylesheet', href=f'{link_to_home}idea.min.css')
+        if code_mode == CODE_CLIENT:
+            link(rel='stylesheet', href=f'{link_to_home}idea.min.css')
+        else:
+            link(rel='stylesheet', href=f'{link_to_home}{HIGHLIGHT_STYLESHEET}')
 
     with doc:
         h1('Smelly Python')
         with div(id=file[0].location.path):
             h4(a('Home', href=f'{link_to_home}index.html'), f' > {file[0].location.path}')
 
-            with pre(id='code-block'):
-                full_file_path = path.join(getcwd(), file[0].location.path)
-                with open(full_file_path, 'r', encoding='utf-8') as code_file:
-                    code(code_file.read(), _class='language-python')
+            if code_mode == CODE_CLIENT:
+                with pre(id='code-block'):
+                    # The source is streamed in place of the marker
+                    code(MARKER, _class='language-python')
+            elif code_mode == CODE_SNIPPET:
+                with pre(id='code-block', data_lines=get_lines_path(file[0].location.path).name):
+                    # The rows of the highlighted lines are streamed in place of the marker
+                    code(MARKER, _class=HIGHLIGHT_CLASS)
+            else:
+                with pre(id='code-block'):
+                    code(MARKER, _class=HIGHLIGHT_CLASS)
 
         with footer():
-            script(src=f'{link_to_home}/highlight.min.js')
-            script(src=f'{link_to_home}/highlightjs-line-numbers.min.js')
-            script('hljs.highlightAll();')
+            if code_mode == CODE_CLIENT:
+                script(src=f'{link_to_home}/highlight.min.js')
+                script(src=f'{link_to_home}/highlightjs-line-numbers.min.js')
+                script('hljs.highlightAll();')
             script(src=f'{link_to_home}/script.js')
-            script(raw(f'setSmells([{",".join(smell.jsonify() for smell in file)}])'))
+            script(raw(f'setSmells({jsonify_code_smells(file)})'))
 
     return doc
 
@@ -63,37 +107,247 @@ def get_html_path(file):
     return Path(file).with_suffix('.html')
 
 
-def _create_code_page(file, output_path):
-    file_page = _generate_code_document(file)
+def get_lines_path(file):
+    """
+    Gets the path of the data file with the highlighted lines of a file, which the snippet
+    pages load on demand.
+    :param: file the path to the file
+    :return: the path to the data file
+    """
+    return Path(file).with_suffix('.lines.js')
+
+
+def _write_highlighted_code(file, html_file, code_mode, full_file_path, open_output):
+    with open(full_file_path, 'r', encoding='utf-8') as code_file:
+        lines = HighlightCache().get_lines(code_file.read())
+    if code_mode == CODE_SNIPPET:
+        windows = get_snippet_windows(file, len(lines))
+        with open_output(get_lines_path(file[0].location.path)) as lines_file:
+            lines_file.write(f'addSourceLines({json.dumps(lines)});')
+    else:
+        windows = [(1, len(lines))]
+    write_code_rows(lines, windows, html_file)
+
+
+def _create_code_page(file, open_output, code_mode=CODE_CLIENT):
+    """
+    Creates the page of a file, and its data file in the CODE_SNIPPET code mode.
+    :param: file the code smells of the file
+    :param: open_output the function that opens a page of the report for writing
+    :param: code_mode the code mode
+    """
+    file_page = _generate_code_document(file, code_mode)
+
+    full_file_path = path.join(getcwd(), file[0].location.path)
+    with open_output(get_html_path(file[0].location.path)) as html_file:
+        if code_mode == CODE_CLIENT:
+            write_document(file_page, html_file,
+                           lambda output_file, _: write_source(full_file_path, output_file))
+        else:
+            write_document(file_page, html_file, lambda output_file, _: _write_highlighted_code(
+                file, output_file, code_mode, full_file_path, open_output))
+
+
+def _render_code_page(file, code_mode):
+    """
+    Creates the pages of a file in memory, so that a worker process can return them to be
+    added to an archive.
+    :return: a dict with the content of every page
+    """
+    pages = {}
+
+    @contextmanager
+    def open_output(page):
+        with io.StringIO() as page_file:
+            yield page_file
+            pages[str(page)] = page_file.getvalue()
+
+    _create_code_page(file, open_output, code_mode)
+    return pages
+
+
+def _hash_code_page(file: [CodeSmell], code_mode):
+    with open(path.join(getcwd(), file[0].location.path), 'rb') as code_file:
+        return hash_inputs(code_mode, code_file.read(), jsonify_code_smells(file))
+
+
+def _is_code_page_changed(file: [CodeSmell], code_mode, manifest: OutputManifest):
+    digest = _hash_code_page(file, code_mode)
+    changed = manifest.is_changed(get_html_path(file[0].location.path), digest)
+    if code_mode == CODE_SNIPPET:
+        # Record the data file as well, so that it is not removed as a stale page
+        changed = manifest.is_changed(get_lines_path(file[0].location.path), digest) or changed
+    return changed
+
+
+def _hash_index(report: Report, explanations: ExplanationFetcher):
+    smells = hash_inputs(report.grade, *(smell.jsonify() for smell in report.code_smells))
+    # Look the explanations up directly, as get_explanation warns about unsupported codes
+    return hash_inputs(smells, *(json.dumps(explanations.explanations[code].to_dict()
+                                            if code in explanations.explanations else None)
+                                 for code in sorted(report.get_index().get_codes())))
+
+
+def _create_code_pages(report: Report, workers, manifest: OutputManifest, code_mode):
+    """
+    Starts creating the pages of the files with code smells whose inputs changed.
+    The code smells are grouped by file while the pages are created, so that a streaming
+    report is never fully in memory. With more than one worker, chunks of files are rendered
+    in a process pool, with at most two chunks per worker in flight. The workers write the
+    pages of an output directory themselves, and return the pages of an archive.
+    :return: a function that waits until all pages have been created
+    """
+    files = (file for file in report.group_by_file()
+             if _is_code_page_changed(file, code_mode, manifest))
+
+    if workers <= 1:
+        def create_pages():
+            for file in files:
+                _create_code_page(file, manifest.open, code_mode)
+        return create_pages
+
+    if isinstance(manifest, ReportArchive):
+        create_chunk = partial(_map_chunk, partial(_render_code_page, code_mode=code_mode))
+    else:
+        create_chunk = partial(_map_chunk, partial(
+            _create_code_page, open_output=partial(open_page, manifest.output_path),
+            code_mode=code_mode))
+    chunks = iter(lambda: list(islice(files, CHUNK_FILES)), [])
+    executor = ProcessPoolExecutor(max_workers=workers)
+    # The first chunks are rendered while the index is built
+    pending = deque(executor.submit(create_chunk, chunk)
+                    for chunk in islice(chunks, workers * 2))
 
-    directory = path.dirname(path.join(output_path, file[0].location.path))
-    os.makedirs(directory, exist_ok=True)
+    def wait():
+        with executor:
+            while pending:
+                # Waiting for the results raises any exception of a worker
+                results = pending.popleft().result()
+                pending.extend(executor.submit(create_chunk, chunk)
+                               for chunk in islice(chunks, 1))
+                if isinstance(manifest, ReportArchive):
+                    for pages in results:
+                        for page, content in pages.items():
+                            manifest.add(page, content)
+    return wait
 
-    html_path = Path(path.join(output_path, file[0].location.path)) \
-        .with_suffix('.html')
-    with open(html_path, 'w', encoding='utf-8') as html_file:
-        html_file.write(str(file_page))
 
+def _map_chunk(function, chunk):
+    return [function(file) for file in chunk]
 
-def generate_webpage(report: Report, explanations = ExplanationFetcher,
-                     output_path=path.join('report', 'smelly_python')):
+
+def generate_webpage(report: Report,  # pylint: disable=too-many-arguments
+                     explanations = ExplanationFetcher,
+                     output_path=path.join('report', 'smelly_python'), *, workers=1, clean=False,
+                     index_mode=INDEX_TABLE, code_mode=CODE_CLIENT, archive=None):
     """
     Generates the webpage showing the errors as a string.
+    The pages of the files are created by the given number of worker processes, while the
+    index is built.
+    Only the pages whose inputs changed since the previous run are written, unless clean
+    is given, which removes the output directory first.
+    With the INDEX_VIRTUAL index mode, the rows of the index are written to sharded data
+    files that a virtual scrolling table loads in the browser, for very large reports.
+    With the CODE_HIGHLIGHTED code mode, the code pages are highlighted when they are
+    generated instead of in the browser, and CODE_SNIPPET only shows the lines around the
+    code smells, loading the other lines on demand.
+    With an archive, all pages, the assets and the code smells as NDJSON are written into
+    that compressed tar archive instead of the output directory.
     :return: the html webpage as a string
     """
-    _create_output(output_path)
+    if archive is None:
+        _create_output(output_path, clean)
+        manifest = OutputManifest(output_path)
+    else:
+        manifest = ReportArchive(archive)
+    try:
+        _write_pages(report, explanations, manifest, workers, index_mode, code_mode)
+    except BaseException:
+        # An archive that misses pages is removed, as it would look like a complete report
+        manifest.abort()
+        raise
+    manifest.finish()
+
+
+def _write_pages(report: Report,  # pylint: disable=too-many-arguments
+                 explanations: ExplanationFetcher, manifest: OutputManifest, workers,
+                 index_mode, code_mode):
+    """
+    Writes the code pages, the index and the static resources of the report.
+    """
+    if isinstance(manifest, ReportArchive):
+        with manifest.open(SMELLS_FILE) as smells_file:
+            write_ndjson(report.code_smells, smells_file)
+    wait_for_code_pages = _create_code_pages(report, workers, manifest, code_mode)
+    if code_mode != CODE_CLIENT:
+        _write_highlight_stylesheet(manifest)
+
+    if index_mode == INDEX_VIRTUAL:
+        shards = write_index_data(report, explanations, manifest, get_html_path)
+        if manifest.is_changed('index.html', hash_inputs(
+                index_mode, report.grade, str(shards),
+                json.dumps(_get_summary(report.get_index())))):
+            _write_index(_generate_index_document(report, shards), manifest)
+    elif manifest.is_changed('index.html', _hash_index(report, explanations)):
+        _write_index(_generate_index_document(report), manifest, report, explanations)
 
+    wait_for_code_pages()
+
+    # Copy static resources
+    for file in Path(path.join(path.dirname(path.dirname(__file__)), 'resources')).glob('*'):
+        manifest.copy_asset(file)
+
+
+def _write_highlight_stylesheet(manifest: OutputManifest):
+    style = get_style_definitions()
+    if manifest.is_changed(HIGHLIGHT_STYLESHEET, hash_inputs(style)):
+        with manifest.open(HIGHLIGHT_STYLESHEET) as file:
+            file.write(style)
+
+
+def _write_index(doc, manifest: OutputManifest, report: Report = None, explanations=None):
+    """
+    Writes the index page. If the report is given, its rows are streamed into the table.
+    """
+    with manifest.open('index.html') as index:
+        if report is None or report.is_clean():
+            index.write(str(doc))
+            return
+        write_document(doc, index, lambda output_file, indent: write_rows(
+            report.code_smells, explanations, get_html_path, output_file, indent))
+
+
+def _get_summary(index: ReportIndex):
+    """
+    Gets the number of code smells of every type, and the files with the most code smells.
+    :return: a tuple of a list of types and counts, and a list of files and counts
+    """
+    types = [(priority.name.lower(), len(index.types[priority]))
+             for priority in Priority if priority in index.types]
+    files = sorted(((file, len(positions)) for file, positions in index.files.items()),
+                   key=lambda item: (-item[1], item[0]))
+    return types, files[:SUMMARY_FILES]
+
+
+def _add_summary(index: ReportIndex):
+    types, files = _get_summary(index)
+    with div(_class='summary'):
+        with p():
+            for name, count in types:
+                span(f'{count} {name}{"s" if count > 1 else ""}', _class=f'summary-type {name}')
+        p(f'The {"file" if len(files) == 1 else f"{len(files)} files"} with the most '
+          'code smells:')
+        with ul():
+            for file, count in files:
+                li(a(file, href=get_html_path(file).as_posix()), f': {count}')
+
+
+def _generate_index_document(report: Report, virtual_shards=None):
     doc = document(title='Smelly Python code smell report')
 
     with doc.head:
         link(rel='stylesheet', href='style.css')
 
-    code_smell_by_file = report.group_by_file()
-    html_paths = {
-        file: get_html_path(file)
-        for file in [file[0].location.path for file in code_smell_by_file]
-    }
-
     with doc:
         h1('Smelly Python')
         h4(f'Your project scored {report.grade}/10')
@@ -101,7 +355,12 @@ def generate_webpage(report: Report, explanations = ExplanationFetcher,
             p('There were no code smells found. Good job!')
             # raw('There were no code smells found! <strong>Good job!</strong>')
 
+        elif virtual_shards is not None:
+            _add_summary(report.get_index())
+            add_virtual_table(virtual_shards)
+
         else:
+            _add_summary(report.get_index())
             with div():
                 with table(_class='smells_table'):
                     with thead():
@@ -113,43 +372,12 @@ def generate_webpage(report: Report, explanations = ExplanationFetcher,
                         row += th('Location')
                         row += th('Explanation')
                     with tbody():
-                        for smell in report.code_smells:
-                            html_path = html_paths[smell.location.path]
-
-                            row = tr(_class='center-text')
-                            table_data = td()
-                            if smell.type == Priority.ERROR:
-                                table_data.add(image(src='error.svg', alt='error'))
-                            elif smell.type == Priority.WARNING:
-                                table_data.add(image(src='warning.svg', alt='warning'))
-                            else:
-                                # Will be "refactor" or "convention"
-                                table_data.add(image(src='info.svg', alt='info'))
-
-                            row += table_data
-                            row += td(a(smell.location.path, href=html_path))
-                            row += td(smell.symbol)
-                            row += td(smell.message)
-                            line_num = smell.location.line
-                            code_smell_link = f'{html_path}#line-' \
-                                              f'{str(line_num - 3 if line_num > 3 else line_num)}'
-                            row += td(a(f'{smell.location.line}:{smell.location.column}',
-                                        href=code_smell_link))
-                            row += td(*explanations.get_explanation(smell.message_id).to_html(),
-                                      _class='explanation')
+                        # The rows are streamed in place of the marker
+                        text(MARKER)
 
         with footer():
             if not report.is_clean():
                 raw('<strong>Icons by svgrepo.com</strong>')
             script(src='script.js')
 
-    for file in code_smell_by_file:
-        _create_code_page(file, output_path)
-
-    # Copy static resources
-    for file in Path(path.join(path.dirname(path.dirname(__file__)), 'resources')).glob('*'):
-        shutil.copy(file, output_path)
-
-    # Create index.html
-    with open(path.join(output_path, 'index.html'), 'w', encoding='utf-8') as index:
-        index.write(str(doc))
+    return doc
@@ -0,0 +1,234 @@
+"""
+The history module stores the code smells of every run in a SQLite database, so that the
+reports of a project can be compared over time without analysing old commits again.
+"""
+import hashlib
+import sqlite3
+import time
+from collections import Counter
+
+from smelly_python.code_smell import CodeSmell
+
+# The number of code smells that are inserted at once
+BATCH_SIZE = 10000
+
+# The columns the top offenders can be counted by
+GROUP_BY_PATH = 'path'
+GROUP_BY_SYMBOL = 'symbol'
+GROUP_BY_MODULE = 'module'
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    created REAL NOT NULL,
+    label TEXT,
+    grade TEXT,
+    smells INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS smells (
+    run INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    path TEXT NOT NULL,
+    module TEXT NOT NULL,
+    object TEXT NOT NULL,
+    line INTEGER,
+    type TEXT NOT NULL,
+    severity INTEGER NOT NULL,
+    symbol TEXT NOT NULL,
+    message_id TEXT NOT NULL,
+    message TEXT NOT NULL,
+    fingerprint INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS smells_run_path ON smells (run, path);
+CREATE INDEX IF NOT EXISTS smells_run_symbol ON smells (run, symbol);
+CREATE INDEX IF NOT EXISTS smells_run_module ON smells (run, module);
+CREATE INDEX IF NOT EXISTS smells_run_type ON smells (run, type);
+CREATE INDEX IF NOT EXISTS smells_path ON smells (path, run);
+CREATE INDEX IF NOT EXISTS smells_symbol ON smells (symbol, run);
+CREATE INDEX IF NOT EXISTS smells_type ON smells (type, run);
+CREATE INDEX IF NOT EXISTS smells_run_fingerprint ON smells (run, fingerprint);
+'''
+
+
+def get_fingerprint(smell: CodeSmell) -> int:
+    """
+    Gets the number that identifies a code smell between runs. It is computed from the file,
+    symbol, object and message, but not the line, which changes whenever code above the smell
+    is edited.
+    :param: smell the code smell
+    :return: a signed 64 bit integer
+    """
+    location = smell.location
+    identity = '\0'.join([location.path, smell.symbol, location.python_object, smell.message])
+    return int.from_bytes(hashlib.blake2b(identity.encode('utf-8'), digest_size=8).digest(),
+                          'big', signed=True)
+
+
+def _to_row(run, smell: CodeSmell):
+    location = smell.location
+    return (run, location.path, location.module, location.python_object, location.line,
+            smell.type.name.lower(), smell.severity(), smell.symbol, smell.message_id,
+            smell.message, get_fingerprint(smell))
+
+
+class ReportHistory:
+    """
+    A SQLite database with the code smells of every stored run.
+    The smells are indexed by run, path, symbol, module and type, so the queries only
+    read the rows of the runs, files or smells they are about.
+    """
+
+    def __init__(self, database_path):
+        self.connection = sqlite3.connect(database_path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute('PRAGMA foreign_keys = ON')
+        self.connection.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        """
+        Closes the database.
+        """
+        self.connection.close()
+
+    def add(self, report, label=None, created=None) -> int:
+        """
+        Stores the code smells of a report as a new run, in one transaction.
+        :param: report the report, a Report or StreamingReport
+        :param: label a label of the run, like a commit or branch name
+        :param: created the time of the run in seconds since the epoch, the current time
+        if None
+        :return: the id of the run
+        """
+        with self.connection:
+            run = self.connection.execute(
+                'INSERT INTO runs (created, label, grade, smells) VALUES (?, ?, ?, ?)',
+                (time.time() if created is None else created, label, report.grade,
+                 len(report.code_smells))).lastrowid
+            batch = []
+            for smell in report.code_smells:
+                batch.append(_to_row(run, smell))
+                if len(batch) == BATCH_SIZE:
+                    self._insert(batch)
+                    batch = []
+            self._insert(batch)
+        return run
+
+    def _insert(self, rows):
+        self.connection.executemany(
+            'INSERT INTO smells (run, path, module, object, line, type, severity, symbol, '
+            'message_id, message, fingerprint) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+
+    def remove(self, run):
+        """
+        Removes a run and its code smells.
+        :param: run the id of the run
+        """
+        with self.connection:
+            self.connection.execute('DELETE FROM runs WHERE id = ?', (run,))
+
+    def get_runs(self, limit=None):
+        """
+        Gets the stored runs, the latest first.
+        :param: limit the maximum number of runs, or None for all runs
+        :return: a list of dicts with the id, created, label, grade and number of smells
+        """
+        rows = self.connection.execute('SELECT * FROM runs ORDER BY id DESC LIMIT ?',
+                                       (-1 if limit is None else limit,))
+        return [dict(row) for row in rows]
+
+    def get_latest_run(self, offset=0):
+        """
+        Gets the id of a recent run.
+        :param: offset the number of runs to skip, 0 for the latest run
+        :return: the id of the run, or None if there are not enough runs
+        """
+        row = self.connection.execute('SELECT id FROM runs ORDER BY id DESC LIMIT 1 OFFSET ?',
+                                      (offset,)).fetchone()
+        return None if row is None else row['id']
+
+    def get_trend(self, path=None, symbol=None, smell_type=None):
+        """
+        Gets the number of code smells of every run, optionally of one file, one smell or one
+        type only.
+        :param: path the path of the file to count the smells of, or None
+        :param: symbol the symbol of the smells to count, or None
+        :param: smell_type the type of the smells to count, like 'error', or None
+        :return: a list of dicts with the id, created, label, grade and number of smells of
+        every run, the oldest first
+        """
+        filters = [(column, value) for column, value in
+                   (('path', path), ('symbol', symbol), ('type', smell_type))
+                   if value is not None]
+        if not filters:
+            rows = self.connection.execute('SELECT * FROM runs ORDER BY id')
+            return [dict(row) for row in rows]
+        # The runs are counted one by one, so that every count uses an index on the run
+        conditions = ' AND '.join(f'smells.{column} = ?' for column, _ in filters)
+        rows = self.connection.execute(
+            f'SELECT runs.id, runs.created, runs.label, runs.grade, '
+            f'(SELECT COUNT(*) FROM smells WHERE smells.run = runs.id AND {conditions}) '
+            f'AS smells FROM runs ORDER BY runs.id',
+            [value for _, value in filters])
+        return [dict(row) for row in rows]
+
+    def get_top_offenders(self, run, group_by=GROUP_BY_PATH, limit=10):
+        """
+        Gets the files, smells or modules with the most code smells in a run.
+        :param: run the id of the run
+        :param: group_by GROUP_BY_PATH, GROUP_BY_SYMBOL or GROUP_BY_MODULE
+        :param: limit the maximum number of offenders
+        :return: a list of tuples of the file, smell or module and its number of smells,
+        the most first
+        """
+        if group_by not in (GROUP_BY_PATH, GROUP_BY_SYMBOL, GROUP_BY_MODULE):
+            raise ValueError(f'Cannot group the code smells by {group_by}.')
+        rows = self.connection.execute(
+            f'SELECT {group_by}, COUNT(*) AS smells FROM smells WHERE run = ? '
+            f'GROUP BY {group_by} ORDER BY smells DESC, {group_by} LIMIT ?', (run, limit))
+        return [tuple(row) for row in rows]
+
+    def compare(self, old_run, new_run):
+        """
+        Compares the code smells of two runs. Smells are the same if they have the same
+        file, symbol, object and message, so smells that only moved to another line are
+        neither new nor fixed. When a smell occurs more often in one run, the extra
+        occurrences are new or fixed.
+        :param: old_run the id of the earlier run
+        :param: new_run the id of the later run
+        :return: a tuple of the lists of new and fixed smells, as dicts with the path,
+        symbol, object, line and message
+        """
+        old_fingerprints = self._count_fingerprints(old_run)
+        new_fingerprints = self._count_fingerprints(new_run)
+        return self._get_smells(new_run, new_fingerprints - old_fingerprints), \
+            self._get_smells(old_run, old_fingerprints - new_fingerprints)
+
+    def _count_fingerprints(self, run) -> Counter:
+        # Only reads the fingerprint index, not the rows of the run, as plain tuples
+        cursor = self.connection.cursor()
+        cursor.row_factory = None
+        cursor.execute('SELECT fingerprint FROM smells WHERE run = ?', (run,))
+        return Counter(fingerprint for fingerprint, in cursor)
+
+    def _get_smells(self, run, fingerprints: Counter):
+        smells = []
+        keys = list(fingerprints)
+        # SQLite limits the number of parameters of a query
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            rows = self.connection.execute(
+                f'SELECT path, symbol, object, line, message, fingerprint FROM smells '
+                f'WHERE run = ? AND fingerprint IN ({", ".join("?" * len(batch))})',
+                (run, *batch))
+            for row in rows:
+                smell = dict(row)
+                fingerprint = smell.pop('fingerprint')
+                if fingerprints[fingerprint] > 0:
+                    fingerprints[fingerprint] -= 1
+                    smells.append(smell)
+        return sorted(smells, key=lambda smell: (smell['path'], smell['line'] or 0))
@@ -0,0 +1,106 @@
+"""
+The history command module provides the command line interface to query the report history.
+"""
+import sys
+from datetime import datetime
+import click
+from smelly_python.code_smell import Priority
+from smelly_python.history import ReportHistory, GROUP_BY_PATH, GROUP_BY_SYMBOL, GROUP_BY_MODULE
+
+DEFAULT_DATABASE = 'smelly_python_history.sqlite'
+
+
+def _print_table(headers, rows):
+    rows = [[str(cell) for cell in row] for row in rows]
+    widths = [max(len(cell) for cell in column) for column in zip(headers, *rows)]
+    for row in [headers, *rows]:
+        print('  '.join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip())
+
+
+def _format_run(run):
+    return [run['id'], datetime.fromtimestamp(run['created']).strftime('%Y-%m-%d %H:%M'),
+            run['label'] or '', run['grade'], run['smells']]
+
+
+def _get_run(history: ReportHistory, run, offset=0):
+    run = history.get_latest_run(offset) if run is None else run
+    if run is None:
+        print('The history does not contain enough runs.')
+        sys.exit(1)
+    return run
+
+
+@click.group()
+@click.option('--database', '-b', type=click.Path(dir_okay=False), default=DEFAULT_DATABASE,
+              show_default=True, help='The SQLite database with the report history.')
+@click.pass_context
+def main(context, database):
+    """
+    Query the code smells that smelly-python --history stored over time.
+    """
+    context.obj = context.with_resource(ReportHistory(database))
+
+
+@main.command()
+@click.option('--limit', '-n', type=click.IntRange(min=1), default=20, show_default=True)
+@click.pass_obj
+def runs(history: ReportHistory, limit):
+    """
+    List the latest runs.
+    """
+    _print_table(['Run', 'Created', 'Label', 'Grade', 'Smells'],
+                 [_format_run(run) for run in history.get_runs(limit)])
+
+
+@main.command()
+@click.option('--path', help='Only count the code smells of this file.')
+@click.option('--symbol', help='Only count this code smell, like line-too-long.')
+@click.option('--type', 'smell_type',
+              type=click.Choice([priority.name.lower() for priority in Priority]),
+              help='Only count the code smells of this type.')
+@click.pass_obj
+def trend(history: ReportHistory, path, symbol, smell_type):
+    """
+    Show the number of code smells of every run.
+    """
+    _print_table(['Run', 'Created', 'Label', 'Grade', 'Smells'],
+                 [_format_run(run) for run in history.get_trend(path, symbol, smell_type)])
+
+
+@main.command()
+@click.option('--run', type=int, help='The run to get the offenders of, the latest by default.')
+@click.option('--by', 'group_by', type=click.Choice([GROUP_BY_PATH, GROUP_BY_SYMBOL,
+                                                     GROUP_BY_MODULE]),
+              default=GROUP_BY_PATH, show_default=True,
+              help='Count the code smells per file, per smell or per module.')
+@click.option('--limit', '-n', type=click.IntRange(min=1), default=10, show_default=True)
+@click.pass_obj
+def top(history: ReportHistory, run, group_by, limit):
+    """
+    Show the files, smells or modules with the most code smells.
+    """
+    _print_table([group_by.capitalize(), 'Smells'],
+                 history.get_top_offenders(_get_run(history, run), group_by, limit))
+
+
+@main.command()
+@click.argument('old_run', type=int, required=False)
+@click.argument('new_run', type=int, required=False)
+@click.pass_obj
+def diff(history: ReportHistory, old_run, new_run):
+    """
+    Show the code smells that are new or fixed in NEW_RUN compared to OLD_RUN.
+    By default the latest two runs are compared.
+    """
+    new_run = _get_run(history, new_run)
+    old_run = _get_run(history, old_run, offset=1)
+    new, fixed = history.compare(old_run, new_run)
+    _print_table(['', 'Path', 'Line', 'Smell', 'Message'],
+                 [[sign, smell['path'], smell['line'], smell['symbol'], smell['message']]
+                  for sign, smells in (('+', new), ('-', fixed)) for smell in smells])
+    print(f'{len(new)} new and {len(fixed)} fixed code smells in run {new_run} '
+          f'compared to run {old_run}.')
+
+
+if __name__ == '__main__':
+    main()  # pylint: disable=no-value-for-parameter
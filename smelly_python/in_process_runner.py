@@ -0,0 +1,86 @@
+"""
+The in process runner module runs pylint inside the current python process, with a reporter
+that collects the code smells in memory instead of writing them to disk.
+"""
+from os import path
+
+from astroid import MANAGER
+from astroid.inference_tip import clear_inference_tip_cache
+from pylint.lint import Run
+from pylint.reporters import BaseReporter
+
+from smelly_python.code_smell import CodeSmell
+
+
+class CollectingReporter(BaseReporter):
+    """
+    A pylint reporter that creates a CodeSmell for every message.
+    The messages are also kept in the pylint JSON format, for the analysis cache.
+    """
+
+    name = 'smelly-python'
+
+    def __init__(self):
+        super().__init__()
+        self.content = []
+        self.code_smells = []
+
+    def handle_message(self, msg):
+        message = {
+            'type': msg.category,
+            'module': msg.module,
+            'obj': msg.obj,
+            'line': msg.line,
+            'column': msg.column,
+            'endLine': msg.end_line,
+            'endColumn': msg.end_column,
+            'path': msg.path,
+            'symbol': msg.symbol,
+            'message': msg.msg or '',
+            'message-id': msg.msg_id
+        }
+        self.content.append(message)
+        self.code_smells.append(CodeSmell(message))
+
+    def display_reports(self, layout):
+        pass
+
+    def _display(self, layout):
+        pass
+
+
+def _forget_modules(targets):
+    """
+    Removes the modules of the targets and of removed files from the astroid cache, so that
+    files that changed since an earlier run in this process are parsed again. The modules of
+    other files, like the installed packages, stay cached.
+    """
+    directories = tuple(path.join(path.abspath(target), '') for target in targets)
+    files = {path.abspath(target) for target in targets}
+    for name, module in list(MANAGER.astroid_cache.items()):
+        module_file = path.abspath(module.file) if module.file else None
+        if module_file in files or module_file is not None \
+                and (module_file.startswith(directories) or not path.isfile(module_file)):
+            del MANAGER.astroid_cache[name]
+    clear_inference_tip_cache()
+
+
+def lint_in_process(targets, jobs=1, reset=False):
+    """
+    Runs pylint on the targets in the current process.
+    The targets are always parsed again, the other modules that astroid parsed during earlier
+    runs are reused, unless the run is reset.
+    :param: targets the files or directories to analyse
+    :param: jobs the number of processes pylint itself may use
+    :param: reset whether to clear all caches of astroid, which is needed when python files
+    were added or removed, as astroid also caches where it found the modules
+    :return: a tuple of the CollectingReporter and the pylint linter after the run
+    :raises SystemExit: if pylint has a usage error
+    """
+    if reset:
+        MANAGER.clear_cache()
+    else:
+        _forget_modules(targets)
+    reporter = CollectingReporter()
+    run = Run([*targets, f'--jobs={jobs}'], reporter=reporter, exit=False)
+    return reporter, run.linter
@@ -0,0 +1,526 @@
+"""
+The pylint runner module runs pylint on the analysed directory. The files can be split into
+shards that are analysed by parallel pylint processes, whose results are merged afterwards.
+"""
+import heapq
+import json
+import os
+import re
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from os import path
+
+from smelly_python.analysis_cache import AnalysisCache
+from smelly_python.code_smell import Report
+from smelly_python.streaming_report import StreamingReport, iter_json_array
+
+SHARD_BY_SIZE = 'size'
+SHARD_BY_COUNT = 'count'
+
+# The directories and file name patterns pylint ignores by default
+IGNORED_DIRECTORIES = ('CVS',)
+IGNORED_PATTERN = re.compile(r'^\.#')
+
+_LINTER_LOCK = threading.Lock()
+
+# The maximum length of the file arguments of one pylint process, below the command line limit
+# of Windows. Longer lists of files are split over several processes.
+MAX_ARGUMENTS_LENGTH = 30000
+
+# The bits pylint sets in its exit code for each message type
+EXIT_CODE_BITS = {'fatal': 1, 'error': 2, 'warning': 4, 'refactor': 8, 'convention': 16}
+
+
+class PylintError(Exception):
+    """
+    Raised when pylint exits with a fatal or usage error.
+    """
+
+    def __init__(self, returncode, output):
+        super().__init__(f'pylint exited with code {returncode}')
+        self.returncode = returncode
+        self.output = output
+
+
+class PylintResult:  # pylint: disable=too-few-public-methods
+    """
+    The PylintResult class contains the messages, the grade and the exit code of a pylint run.
+    The number of analysed statements is only known if the run computed the grade itself.
+    """
+
+    def __init__(self, content, grade, exit_code,  # pylint: disable=too-many-arguments
+                 *, code_smells=None, statements=None, json_path=None):
+        self._content = content
+        self.grade = grade
+        self.exit_code = exit_code
+        self.code_smells = code_smells
+        self.statements = statements
+        self.json_path = json_path
+
+    @property
+    def content(self):
+        """
+        The messages in the pylint JSON format, read from the JSON file on first access
+        if the run did not keep them in memory.
+        """
+        if self._content is None:
+            with open(self.json_path, 'r', encoding='utf-8') as input_file:
+                self._content = json.load(input_file)
+        return self._content
+
+    def iter_messages(self):
+        """
+        Iterates over the messages, reading the JSON file incrementally if the run did not
+        keep them in memory.
+        :return: an iterator of the messages in the pylint JSON format
+        """
+        if self._content is not None:
+            yield from self._content
+            return
+        with open(self.json_path, 'r', encoding='utf-8') as input_file:
+            yield from iter_json_array(input_file)
+
+    def to_report(self, streaming=False):
+        """
+        Creates the Report of this pylint run, from the CodeSmell objects if the
+        run already created them.
+        :param: streaming whether to read the JSON file incrementally into a StreamingReport
+        if the messages are not in memory yet
+        :return: the report
+        """
+        if self.code_smells is not None:
+            return Report.from_code_smells(self.code_smells, self.grade)
+        if streaming and self._content is None:
+            return StreamingReport.from_file(self.json_path, self.grade)
+        return Report(self.content, self.grade)
+
+
+def get_grade(text: str) -> str:
+    """
+    Extracts the grade from the text exported by pylint.
+    :param: text the exported text
+    :return: the grade with one decimal place
+    """
+    search = re.search(r'Your code has been rated at (\d+)\.?(\d*)', text)
+
+    if search.group(2).lstrip('0') == '':
+        return search.group(1)
+
+    return search.group(1) + '.' + search.group(2)
+
+
+def compute_grade(content, statements) -> str:
+    """
+    Computes the grade the same way pylint does by default, from the messages and the
+    number of analysed statements.
+    :param: content the messages in the pylint JSON format
+    :param: statements the number of analysed statements
+    :return: the grade, formatted like get_grade
+    """
+    counts = {}
+    _count_types(content, counts)
+    return _compute_grade(counts, statements)
+
+
+def _count_types(content, counts):
+    for message in content:
+        counts[message['type']] = counts.get(message['type'], 0) + 1
+
+
+def _compute_grade(counts, statements) -> str:
+    if counts.get('fatal', 0) > 0 or statements == 0:
+        score = 0.0 if counts.get('fatal', 0) > 0 else 10.0
+    else:
+        penalty = 5 * counts.get('error', 0) + counts.get('warning', 0) \
+                  + counts.get('refactor', 0) + counts.get('convention', 0)
+        score = max(0.0, 10.0 - penalty / statements * 10)
+    return format_grade(score)
+
+
+def format_grade(score) -> str:
+    """
+    Formats a score the way pylint does, without trailing zeros if it is whole.
+    :param: score the score as a number
+    :return: the grade, formatted like get_grade
+    """
+    return get_grade(f'Your code has been rated at {score:.2f}/10')
+
+
+def compute_exit_code(content) -> int:
+    """
+    Computes the exit code pylint would give for the messages.
+    :param: content the messages in the pylint JSON format
+    :return: the exit code
+    """
+    exit_code = 0
+    for message in content:
+        exit_code |= EXIT_CODE_BITS.get(message['type'], 0)
+    return exit_code
+
+
+def find_python_files(directory, sort=True):
+    """
+    Finds the python files pylint analyses when it is given the directory, with the ignore,
+    ignore-patterns and ignore-paths options of the pylint configuration. Like pylint, only
+    the subdirectories that are packages are searched if the directory is a package, and all
+    subdirectories otherwise.
+    :param: directory the directory to search
+    :param: sort whether to sort the files, or keep them in the order pylint analyses them
+    :return: a list of paths to python files
+    """
+    files = _expand_targets([directory])
+    if files is None:
+        files = _walk_python_files(directory)
+    return sorted(files) if sort else files
+
+
+def filter_ignored_files(files):
+    """
+    Removes the files pylint does not analyse when it is given them, because they match the
+    ignore options of the pylint configuration.
+    :param: files the paths of the python files
+    :return: a list of the paths of the files pylint analyses, in the same order
+    """
+    analysed = _expand_targets(files)
+    if analysed is None:
+        return [file for file in files if not IGNORED_PATTERN.match(path.basename(file))]
+    analysed = {path.normpath(file) for file in analysed}
+    return [file for file in files if path.normpath(file) in analysed]
+
+
+def _expand_targets(targets):
+    """
+    Expands the targets into the python files pylint analyses, like pylint does.
+    :return: a list of paths, or None if pylint cannot be loaded
+    """
+    linter = _get_linter()
+    if linter is None:
+        return None
+    # The linter is shared between the directories that are analysed concurrently
+    with _LINTER_LOCK:
+        if linter.config.recursive:
+            targets = list(linter._discover_files(targets))  # pylint: disable=protected-access
+        modules = linter._expand_files(targets)  # pylint: disable=protected-access
+    # pylint returns a list of modules before version 3, and lists the ignored files
+    # since version 3.3
+    return [module['path'] for module in
+            (modules.values() if isinstance(modules, dict) else modules)
+            if module['path'].endswith('.py') and not module.get('isignored')]
+
+
+def _walk_python_files(directory):
+    """
+    Finds the python files in the directory with the default ignore options of pylint.
+    """
+    if path.isfile(directory):
+        return [directory]
+    # astroid is only imported when the files have to be listed
+    from astroid.modutils import get_module_files  # pylint: disable=import-outside-toplevel
+
+    is_package = path.isfile(path.join(directory, '__init__.py'))
+    return [file for file in get_module_files(directory, IGNORED_DIRECTORIES,
+                                              list_all=not is_package)
+            if file.endswith('.py') and not IGNORED_PATTERN.match(path.basename(file))]
+
+
+def _get_linter():
+    """
+    Gets a pylint linter with the configuration pylint reads when it runs from the working
+    directory, which is loaded again when the configuration file changes.
+    :return: the linter, or None if pylint cannot be imported or the configuration is invalid
+    """
+    try:
+        # pylint is only imported when the files have to be listed
+        from pylint.config import find_default_config_files  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        return None
+    config_file = next(find_default_config_files(), None)
+    try:
+        modified = os.stat(config_file).st_mtime_ns if config_file else None
+    except OSError:
+        modified = None
+    return _load_linter(str(config_file) if config_file else None, modified)
+
+
+@lru_cache(maxsize=1)
+def _load_linter(config_file, _modified):
+    # pylint: disable=import-outside-toplevel,protected-access
+    from pylint.config.config_initialization import _config_initialization
+    from pylint.lint import PyLinter
+    from pylint.reporters import CollectingReporter
+
+    linter = PyLinter()
+    linter.load_default_plugins()
+    try:
+        _config_initialization(linter, [], CollectingReporter(), config_file=config_file)
+    except SystemExit:
+        # pylint reports the invalid configuration when it runs
+        return None
+    linter._ignore_paths = linter.config.ignore_paths
+    return linter
+
+
+def split_shards(files, jobs, shard_by=SHARD_BY_SIZE):
+    """
+    Splits the files into at most jobs balanced shards.
+    Shards by size are balanced on the total number of bytes, by assigning the largest files
+    first to the shard that is the smallest so far.
+    :param: files the paths of the files to split
+    :param: jobs the maximum number of shards
+    :param: shard_by either SHARD_BY_SIZE or SHARD_BY_COUNT
+    :return: a list of non-empty lists of paths
+    """
+    jobs = max(1, min(jobs, len(files)))
+    if shard_by == SHARD_BY_COUNT:
+        shards = [files[index::jobs] for index in range(jobs)]
+    else:
+        shards = [[] for _ in range(jobs)]
+        heap = [(0, index) for index in range(jobs)]
+        for file in sorted(files, key=path.getsize, reverse=True):
+            size, index = heapq.heappop(heap)
+            shards[index].append(file)
+            heapq.heappush(heap, (size + path.getsize(file), index))
+    return [sorted(shard) for shard in shards if shard]
+
+
+def split_arguments(files, max_length=MAX_ARGUMENTS_LENGTH):
+    """
+    Splits the files into batches whose paths fit on the command line of one process.
+    :param: files the paths of the files to split
+    :param: max_length the maximum total length of the paths of a batch
+    :return: a list of non-empty lists of paths
+    """
+    batches = [[]]
+    length = 0
+    for file in files:
+        if batches[-1] and length + len(file) + 1 > max_length:
+            batches.append([])
+            length = 0
+        batches[-1].append(file)
+        length += len(file) + 1
+    return [batch for batch in batches if batch]
+
+
+def _run_process(targets, json_path, text_path, extra_args=()):
+    """
+    Runs one pylint process.
+    :return: the exit code of pylint
+    """
+    try:
+        subprocess.run(['pylint', *targets, *extra_args,
+                        f'--output-format=json:{json_path},text:{text_path}'],
+                       capture_output=True, text=True, check=True)
+    except subprocess.CalledProcessError as error:
+        # Either fatal error, or usage error
+        if error.returncode == 1 or error.returncode >= 32:
+            with open(text_path, 'r', encoding='utf-8') as text_report:
+                raise PylintError(error.returncode, text_report.read()) from error
+        return error.returncode
+    return 0
+
+
+def _run_single(targets, report_dir, count_statements=False) -> PylintResult:
+    """
+    Runs one pylint process and reads its results.
+    The number of analysed statements is only read from the pylint reports if it is counted.
+    """
+    json_path = path.join(report_dir, 'report.json')
+    text_path = path.join(report_dir, 'grade.txt')
+    exit_code = _run_process(targets, json_path, text_path,
+                             extra_args=['--reports=y'] if count_statements else ())
+    with open(text_path, 'r', encoding='utf-8') as input_file:
+        text = input_file.read()
+    return PylintResult(None, get_grade(text), exit_code, json_path=json_path,
+                        statements=_read_statements(text) if count_statements else None)
+
+
+def _read_statements(text) -> int:
+    search = re.search(r'(\d+) statements analysed', text)
+    return int(search.group(1)) if search is not None else 0
+
+
+def run_pylint(directory, report_dir, jobs=1,  # pylint: disable=too-many-arguments
+               shard_by=SHARD_BY_SIZE, *, cache: AnalysisCache = None,
+               files=None, in_process=False, count_statements=False) -> PylintResult:
+    """
+    Runs pylint on the directory and reads its results.
+    With more than one job, the python files are split into shards that are analysed by
+    parallel pylint processes. The messages are merged and the grade is computed over all
+    statements, so it is weighted by the size of each shard.
+    With a cache, only the files that changed since the previous run and the files that
+    import them are analysed, and the cached messages are used for the other files.
+    In process, pylint runs inside this python process and uses its own parallel jobs
+    instead of shards, and no output is written to the report directory.
+    Files that do not fit on one command line are split over several pylint processes.
+    Note that messages about multiple modules, like duplicate-code, are only found within
+    a shard or within the changed files.
+    :param: directory the directory to analyse
+    :param: report_dir the directory to write the pylint output to
+    :param: jobs the number of parallel pylint processes
+    :param: shard_by how to balance the shards, SHARD_BY_SIZE or SHARD_BY_COUNT
+    :param: cache the analysis cache of the directory, or None to analyse all files
+    :param: files the python files to analyse instead of the whole directory
+    :param: in_process whether to run pylint in this process instead of a subprocess
+    :param: count_statements whether the result needs the number of analysed statements,
+    which a single pylint process only reports when asked
+    :return: the result of the pylint run
+    :raises PylintError: if pylint exits with a fatal or usage error
+    """
+    if in_process:
+        def analyse(targets, fallback=None):
+            # astroid caches where modules are found, which changes when files are added or removed
+            return _run_in_process(fallback or targets, jobs,
+                                   reset=cache is not None and cache.modules_changed)
+    else:
+        def analyse(targets, fallback=None):
+            return _run_sharded(targets, report_dir, jobs, shard_by, fallback=fallback,
+                                count_statements=count_statements)
+
+    if cache is not None:
+        project_files = find_python_files(directory, sort=False)
+        if files is None:
+            return _run_incremental(project_files, report_dir, cache, analyse,
+                                    fallback=[directory], last_file=project_files[-1:])
+        # Like pylint, the cache skips the ignored files, so their statements are not counted
+        return _run_incremental(filter_ignored_files(files), report_dir, cache, analyse,
+                                project_files=project_files)
+    if files is not None:
+        return analyse(files)
+    if in_process:
+        return _run_in_process([directory], jobs)
+    if jobs <= 1:
+        return _run_single([directory], report_dir, count_statements)
+    return _run_sharded(find_python_files(directory), report_dir, jobs, shard_by,
+                        fallback=[directory], count_statements=count_statements)
+
+
+def _run_in_process(targets, jobs, reset=False) -> PylintResult:
+    # pylint is only imported when it runs in process
+    # pylint: disable=import-outside-toplevel
+    from smelly_python.in_process_runner import lint_in_process
+
+    try:
+        reporter, linter = lint_in_process(targets, jobs, reset)
+    except SystemExit as error:
+        # Usage errors exit, even though exit is False
+        raise PylintError(error.code if isinstance(error.code, int) else 32, '') from error
+
+    # Either fatal error, or usage error
+    if linter.msg_status == 1 or linter.msg_status >= 32:
+        raise PylintError(linter.msg_status, '\n'.join(
+            f'{message["path"]}: {message["message"]}' for message in reporter.content))
+
+    statements = linter.stats.statement
+    grade = format_grade(linter.stats.global_note) if statements \
+        else compute_grade(reporter.content, 0)
+    return PylintResult(reporter.content, grade, linter.msg_status,
+                        code_smells=reporter.code_smells, statements=statements)
+
+
+def _run_incremental(files, report_dir, cache,  # pylint: disable=too-many-arguments
+                     analyse, *, fallback=None, project_files=None,
+                     last_file=()) -> PylintResult:
+    changed = cache.changed_files(files, project_files)
+    print(f'Analysing {len(changed)} of {len(files)} files, the others are cached.')
+    # When all files changed, pylint is given the directory instead of every file
+    if changed:
+        content = analyse(changed, fallback if len(changed) == len(files) else None).content
+    else:
+        content = []
+    cache.update(changed, content)
+    try:
+        cache.save()
+    except OSError:
+        print('Could not write the analysis cache.')
+
+    # pylint reports the messages about multiple modules on the last file it analyses
+    content = cache.messages(files, *last_file)
+    json_path = path.join(report_dir, 'report.json')
+    with open(json_path, 'w', encoding='utf-8') as output_file:
+        json.dump(content, output_file)
+    statements = cache.statements(files)
+    # Like the output of pylint, the messages are read from the file, so they can be streamed
+    return PylintResult(None, compute_grade(content, statements), compute_exit_code(content),
+                        statements=statements, json_path=json_path)
+
+
+def _run_sharded(files, report_dir, jobs,  # pylint: disable=too-many-arguments
+                 shard_by, *, fallback=None, count_statements=False) -> PylintResult:
+    shards = split_shards(files, jobs, shard_by)
+    if len(shards) <= 1 and fallback is not None:
+        return _run_single(fallback, report_dir, count_statements)
+    shards = [batch for shard in shards for batch in split_arguments(shard)]
+    if len(shards) <= 1:
+        return _run_single(files, report_dir, count_statements)
+
+    shard_paths = [(path.join(report_dir, f'report-{index}.json'),
+                    path.join(report_dir, f'grade-{index}.txt')) for index in range(len(shards))]
+    with ThreadPoolExecutor(max_workers=min(jobs, len(shards))) as executor:
+        exit_codes = list(executor.map(
+            lambda args: _run_process(args[0], *args[1], extra_args=['--reports=y']),
+            zip(shards, shard_paths)))
+
+    json_path = path.join(report_dir, 'report.json')
+    counts, statements = _merge_shards(shard_paths, json_path)
+
+    exit_code = 0
+    for code in exit_codes:
+        exit_code |= code
+    # The messages are read from the merged file again, so that they can be streamed
+    return PylintResult(None, _compute_grade(counts, statements), exit_code,
+                        statements=statements, json_path=json_path)
+
+
+def merge_results(results, json_path) -> PylintResult:
+    """
+    Merges the results of the pylint runs of multiple directories. The grade is computed over
+    all statements, so it is weighted by the size of each directory. The messages are written
+    to the JSON file one result at a time, and the merged result reads them from that file.
+    :param: results the results, which must know the number of analysed statements
+    :param: json_path the path to write the merged messages to
+    :return: the merged result
+    """
+    counts = {}
+    statements = 0
+    exit_code = 0
+    separator = ''
+    with open(json_path, 'w', encoding='utf-8') as output_file:
+        output_file.write('[')
+        for result in results:
+            for message in result.iter_messages():
+                counts[message['type']] = counts.get(message['type'], 0) + 1
+                output_file.write(separator)
+                json.dump(message, output_file)
+                separator = ', '
+            statements += result.statements or 0
+            exit_code |= result.exit_code
+        output_file.write(']')
+    return PylintResult(None, _compute_grade(counts, statements), exit_code,
+                        statements=statements, json_path=json_path)
+
+
+def _merge_shards(shard_paths, json_path):
+    """
+    Writes the messages of all shards to one JSON file, reading one shard at a time.
+    :return: a tuple of the number of messages of every type and the total number of analysed
+    statements
+    """
+    counts = {}
+    statements = 0
+    separator = ''
+    with open(json_path, 'w', encoding='utf-8') as output_file:
+        output_file.write('[')
+        for shard_json_path, text_path in shard_paths:
+            with open(shard_json_path, 'r', encoding='utf-8') as input_file:
+                content = json.load(input_file)
+            _count_types(content, counts)
+            for message in content:
+                output_file.write(separator)
+                json.dump(message, output_file)
+                separator = ', '
+            with open(text_path, 'r', encoding='utf-8') as input_file:
+                statements += _read_statements(input_file.read())
+        output_file.write(']')
+    return counts, statements
@@ -0,0 +1,67 @@
+"""
+The report index module provides the ReportIndex, which groups the code smells of a report by
+file, symbol, type and module in a single pass.
+"""
+from array import array
+from bisect import bisect_left
+
+
+def _add(index, key, position):
+    positions = index.get(key)
+    if positions is None:
+        positions = index[key] = array('I')
+    positions.append(position)
+
+
+class ReportIndex:
+    """
+    Hash indexes of the code smells of a report by file, symbol, type and module.
+    Every index maps its keys, in the order they first occur, to the positions of their code
+    smells in the report, in ascending order. The positions are kept in compact arrays, so
+    the code smells themselves do not have to stay in memory, and the number of smells of a
+    key from any position on is found with a binary search.
+    """
+
+    def __init__(self, code_smells):
+        """
+        Builds the indexes in one pass over the code smells.
+        :param: code_smells an iterable of CodeSmell objects, in the order of the report
+        """
+        self.files = {}
+        self.symbols = {}
+        self.types = {}
+        self.modules = {}
+        # The first code smell of every symbol, which has its type and message id
+        self.first_smells = {}
+        self.length = 0
+        for position, smell in enumerate(code_smells):
+            location = smell.location
+            _add(self.files, location.path, position)
+            _add(self.types, smell.type, position)
+            _add(self.modules, location.module, position)
+            if smell.symbol not in self.symbols:
+                self.first_smells[smell.symbol] = smell
+            _add(self.symbols, smell.symbol, position)
+            self.length = position + 1
+
+    @staticmethod
+    def get_counts(index, start=0):
+        """
+        Counts the code smells of every key of an index, from a position of the report on.
+        :param: index one of the indexes, like files or symbols
+        :param: start the position of the first code smell to count
+        :return: a dict with the number of smells of every key that has any
+        """
+        counts = {}
+        for key, positions in index.items():
+            count = len(positions) - bisect_left(positions, start)
+            if count > 0:
+                counts[key] = count
+        return counts
+
+    def get_codes(self):
+        """
+        Gets the message ids of all code smells.
+        :return: a set of message ids
+        """
+        return {smell.message_id for smell in self.first_smells.values()}
@@ -11,31 +11,14 @@ function addToDictionary(dict, key, value) {
     dict[key].push(value);
 }
 
-window.onload = async function () {
-    // Add line numbers
-    for (const block of document.getElementsByClassName('hljs')) {
-        hljs.lineNumbersBlock(block);
-    }
-
-    const smellsPerLine = {};
-    for (smell of codeSmells) {
-        var currentLine = smell.location.line;
-        do {
-            addToDictionary(smellsPerLine, currentLine, smell);
-            currentLine++;
-        } while (currentLine <= smell.location.end_line && smell.location.end_line !== null);
-    }
-
-    var trs;
-    do {
-        trs = document.querySelectorAll('#code-block > code > table > tbody > tr');
-        // Wait for the table to exist, as the plugin does an async function
-        // that it doesn't return the Promise of :(
-        await new Promise(r => setTimeout(r, 1));
-    } while (trs.length === 0);
+var smellsPerLine = {};
+var sourceLines;
+var pendingGaps = [];
 
+function decorateRows(trs) {
     for (const [index, tr] of trs.entries()) {
-        const line = index + 1;
+        // Rows highlighted at generation time know their line, the client side rows start at 1
+        const line = tr.dataset.line !== undefined ? Number(tr.dataset.line) : index + 1;
         if (line in smellsPerLine) {
             // Sort by severity, non-ascending
             const smells = smellsPerLine[line].sort((a, b) => b.severity - a.severity);
@@ -51,9 +34,187 @@ window.onload = async function () {
         }
         tr.setAttribute('id', `line-${line}`);
     }
+}
+
+function addSourceLines(lines) {
+    sourceLines = lines;
+    for (const gap of pendingGaps.splice(0)) {
+        showGap(gap);
+    }
+}
+
+function showGap(gap) {
+    if (sourceLines === undefined) {
+        // Load the lines of the file the first time a gap is opened
+        if (pendingGaps.includes(gap)) {
+            return;
+        }
+        if (pendingGaps.push(gap) === 1) {
+            const element = document.createElement('script');
+            element.src = document.getElementById('code-block').dataset.lines;
+            document.body.appendChild(element);
+        }
+        return;
+    }
+    const rows = [];
+    for (let line = Number(gap.dataset.start); line <= Number(gap.dataset.end); line++) {
+        const tr = document.createElement('tr');
+        tr.dataset.line = line;
+        tr.innerHTML = `<td class="hljs-ln-numbers">${line}</td>`
+            + `<td class="hljs-ln-code">${sourceLines[line - 1]}</td>`;
+        rows.push(tr);
+    }
+    gap.replaceWith(...rows);
+    decorateRows(rows);
+}
+
+window.onload = async function () {
+    if (codeSmells === undefined) {
+        // Not a page of a file
+        return;
+    }
+
+    for (smell of codeSmells) {
+        var currentLine = smell.location.line;
+        do {
+            addToDictionary(smellsPerLine, currentLine, smell);
+            currentLine++;
+        } while (currentLine <= smell.location.end_line && smell.location.end_line !== null);
+    }
+
+    var trs;
+    if (typeof hljs === 'undefined') {
+        // The code was highlighted when the report was generated
+        trs = document.querySelectorAll('#code-block > code > table > tbody > tr[data-line]');
+        for (const gap of document.querySelectorAll('#code-block tr.gap')) {
+            gap.addEventListener('click', () => showGap(gap));
+        }
+    } else {
+        // Add line numbers
+        for (const block of document.getElementsByClassName('hljs')) {
+            hljs.lineNumbersBlock(block);
+        }
+
+        do {
+            trs = document.querySelectorAll('#code-block > code > table > tbody > tr');
+            // Wait for the table to exist, as the plugin does an async function
+            // that it doesn't return the Promise of :(
+            await new Promise(r => setTimeout(r, 1));
+        } while (trs.length === 0);
+    }
+
+    decorateRows(trs);
 
     // Scroll to line number if necessary
     if (window.location.hash !== '') {
         window.scrollTo({ top: document.querySelector(window.location.hash).offsetTop});
     }
 }
+
+// Virtual scrolling table of the index page of large reports
+
+const ROW_HEIGHT = 32;
+const SEVERITY_ICONS = {error: 'error.svg', warning: 'warning.svg'};
+const SORT_KEYS = {
+    severity: row => row[0],
+    path: row => row[2],
+    symbol: row => row[4],
+    message: row => row[5],
+    line: row => row[6],
+    explanation: row => row[8]
+};
+
+var smellRows = [];
+var visibleRows = [];
+var explanations = {};
+var sortColumn = null;
+var sortDescending = false;
+
+function addSmellRows(rows) {
+    for (const row of rows) {
+        smellRows.push(row);
+    }
+}
+
+function setExplanations(newExplanations) {
+    explanations = newExplanations;
+}
+
+function loadSmellShards(directory, count) {
+    let loaded = 0;
+    for (let shard = 0; shard < count; shard++) {
+        const element = document.createElement('script');
+        element.src = `${directory}/smells-${String(shard).padStart(5, '0')}.js`;
+        // Shards are loaded in parallel but executed in order
+        element.async = false;
+        element.onload = () => {
+            loaded++;
+            if (loaded === count) {
+                initVirtualTable();
+            }
+        };
+        document.body.appendChild(element);
+    }
+}
+
+const HTML_ESCAPES = {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'};
+
+function escapeHtml(text) {
+    return String(text).replace(/[&<>"']/g, character => HTML_ESCAPES[character]);
+}
+
+function renderRow(row) {
+    const [severity, type, path, htmlPath, symbol, message, line, column, messageId] = row;
+    const icon = SEVERITY_ICONS[type] || 'info.svg';
+    const target = `${htmlPath}#line-${line > 3 ? line - 3 : line}`;
+    return `<tr class="center-text">`
+        + `<td><img alt="${type}" src="${icon}"></td>`
+        + `<td><a href="${escapeHtml(htmlPath)}">${escapeHtml(path)}</a></td>`
+        + `<td>${escapeHtml(symbol)}</td>`
+        + `<td title="${escapeHtml(message)}">${escapeHtml(message)}</td>`
+        + `<td><a href="${escapeHtml(target)}">${line}:${column}</a></td>`
+        + `<td class="explanation">${explanations[messageId] || '-'}</td>`
+        + `</tr>`;
+}
+
+function renderVisibleRows() {
+    const container = document.getElementById('virtual-table');
+    const first = Math.floor(container.scrollTop / ROW_HEIGHT);
+    const count = Math.ceil(container.clientHeight / ROW_HEIGHT) + 1;
+    const rows = document.getElementById('virtual-rows');
+    rows.style.top = `${first * ROW_HEIGHT}px`;
+    rows.innerHTML = visibleRows.slice(first, first + count).map(renderRow).join('');
+}
+
+function updateVirtualTable() {
+    const text = document.getElementById('smell-filter').value.toLowerCase();
+    const severity = document.getElementById('severity-filter').value;
+    visibleRows = smellRows.filter(row =>
+        (severity === '' || row[1] === severity)
+        && (text === '' || [row[2], row[4], row[5], row[8]]
+            .some(value => value.toLowerCase().includes(text))));
+    if (sortColumn !== null) {
+        const key = SORT_KEYS[sortColumn];
+        const direction = sortDescending ? -1 : 1;
+        // Array.prototype.sort is stable, so ties keep the severity order
+        visibleRows.sort((a, b) => key(a) < key(b) ? -direction : key(a) > key(b) ? direction : 0);
+    }
+    document.getElementById('virtual-spacer').style.height = `${visibleRows.length * ROW_HEIGHT}px`;
+    document.getElementById('smell-count').innerText =
+        `Showing ${visibleRows.length} of ${smellRows.length} code smells`;
+    renderVisibleRows();
+}
+
+function initVirtualTable() {
+    for (const header of document.querySelectorAll('th[data-sort]')) {
+        header.addEventListener('click', () => {
+            sortDescending = sortColumn === header.dataset.sort ? !sortDescending : false;
+            sortColumn = header.dataset.sort;
+            updateVirtualTable();
+        });
+    }
+    document.getElementById('smell-filter').addEventListener('input', updateVirtualTable);
+    document.getElementById('severity-filter').addEventListener('change', updateVirtualTable);
+    document.getElementById('virtual-table').addEventListener('scroll', renderVisibleRows);
+    updateVirtualTable();
+}
@@ -0,0 +1,50 @@
+"""
+The smell export module serializes many code smells at once, for the pages of the html report
+and as newline delimited JSON (NDJSON) for other tools.
+Every code smell is encoded with the schema of CodeSmell.jsonify.
+"""
+from itertools import islice
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def jsonify_code_smells(code_smells) -> str:
+    """
+    Creates a JSON array containing the code smells.
+    :param: code_smells the CodeSmell objects
+    :return: a string with the JSON array
+    """
+    return f'[{", ".join([smell.jsonify() for smell in code_smells])}]'
+
+
+def write_ndjson(code_smells, file, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Writes the code smells as NDJSON, one JSON object per line.
+    The code smells are encoded and written in batches, so that at most batch_size of them
+    are kept in memory.
+    :param: code_smells an iterable of CodeSmell objects
+    :param: file the text file to write to
+    :param: batch_size the number of code smells to write at once
+    :return: the number of code smells that were written
+    """
+    iterator = iter(code_smells)
+    count = 0
+    while True:
+        batch = [smell.jsonify() for smell in islice(iterator, batch_size)]
+        if not batch:
+            return count
+        batch.append('')
+        file.write('\n'.join(batch))
+        count += len(batch) - 1
+
+
+def export_ndjson(report, output_path, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Exports the code smells of a report as NDJSON, ordered by severity.
+    :param: report the Report or StreamingReport to export
+    :param: output_path the path of the NDJSON file
+    :param: batch_size the number of code smells to write at once
+    :return: the number of code smells that were written
+    """
+    with open(output_path, 'w', encoding='utf-8') as file:
+        return write_ndjson(report.code_smells, file, batch_size)
@@ -0,0 +1,186 @@
+"""
+The streaming report module provides a Report that reads the pylint JSON output incrementally
+and keeps its code smells ordered in bounded memory, by spilling sorted runs to disk.
+"""
+import heapq
+import json
+import pickle
+import tempfile
+from itertools import groupby
+from os import path
+
+from smelly_python.code_smell import CodeSmell
+from smelly_python.report_index import ReportIndex
+
+DEFAULT_CHUNK_SIZE = 1 << 16
+DEFAULT_MAX_IN_MEMORY = 50000
+
+
+def iter_json_array(file, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Iterates over the objects of a JSON array without reading the whole file in memory.
+    :param: file a text file containing a JSON array of objects
+    :param: chunk_size the number of characters to read at once
+    :return: a generator of the decoded objects
+    :raises ValueError: if the file does not contain a JSON array
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    while True:
+        # Skip whitespace and separators, reading more of the file if needed
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if position == len(buffer):
+            chunk = file.read(chunk_size)
+            if not chunk:
+                raise ValueError('Unexpected end of the JSON array.')
+            buffer, position = chunk, 0
+            continue
+
+        if not started:
+            if buffer[position] != '[':
+                raise ValueError('The JSON content is not an array.')
+            started = True
+            position += 1
+        elif buffer[position] == ']':
+            return
+        else:
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # The object continues in the next chunk
+                chunk = file.read(chunk_size)
+                if not chunk:
+                    raise
+                buffer, position = buffer[position:] + chunk, 0
+                continue
+            yield item
+
+
+class SpilledCodeSmells:
+    """
+    An ordered, iterable collection of CodeSmells.
+    At most max_in_memory smells are kept in memory; every time that limit is reached they
+    are sorted and written to a run file in the directory. Iterating merges all runs.
+    Smells with equal keys keep the order in which they were added.
+    """
+
+    def __init__(self, key, directory, max_in_memory=DEFAULT_MAX_IN_MEMORY):
+        self._key = key
+        self._directory = directory
+        self._max_in_memory = max_in_memory
+        self._buffer = []
+        self._runs = []
+        self._length = 0
+
+    def add(self, smell: CodeSmell):
+        """
+        Adds a code smell.
+        :param: smell the code smell to add
+        """
+        self._buffer.append((self._length, smell))
+        self._length += 1
+        if len(self._buffer) >= self._max_in_memory:
+            self._spill()
+
+    def _sort_key(self, item):
+        return self._key(item[1]), item[0]
+
+    def _spill(self):
+        run_path = path.join(self._directory, f'run-{id(self)}-{len(self._runs)}.pickle')
+        with open(run_path, 'wb') as run_file:
+            for item in sorted(self._buffer, key=self._sort_key):
+                pickle.dump(item, run_file, pickle.HIGHEST_PROTOCOL)
+        self._runs.append(run_path)
+        self._buffer = []
+
+    @staticmethod
+    def _read_run(run_path):
+        with open(run_path, 'rb') as run_file:
+            while True:
+                try:
+                    yield pickle.load(run_file)
+                except EOFError:
+                    return
+
+    def __iter__(self):
+        runs = [self._read_run(run_path) for run_path in self._runs]
+        runs.append(iter(sorted(self._buffer, key=self._sort_key)))
+        return (smell for _, smell in heapq.merge(*runs, key=self._sort_key))
+
+    def __len__(self):
+        return self._length
+
+
+class StreamingReport:
+    """
+    A Report that is read incrementally from the JSON file generated by pylint.
+    The code smells are ordered by severity like in Report, and group_by_file groups all
+    code smells of a file in the same order as Report, without keeping more than
+    max_in_memory smells in memory.
+    """
+
+    def __init__(self, json_file, grade, max_in_memory=DEFAULT_MAX_IN_MEMORY):
+        # pylint: disable=consider-using-with
+        self._directory = tempfile.TemporaryDirectory(prefix='smelly_python-')
+        self._max_in_memory = max_in_memory
+        self.code_smells = SpilledCodeSmells(lambda s: -s.severity(), self._directory.name,
+                                             max_in_memory // 2)
+        self._by_file = None
+        for data in iter_json_array(json_file):
+            smell = CodeSmell(data)
+            self.code_smells.add(smell)
+        self.grade = grade
+        self._index = None
+
+    @staticmethod
+    def from_file(json_path, grade, max_in_memory=DEFAULT_MAX_IN_MEMORY):
+        """
+        Creates a StreamingReport from the path of the JSON file generated by pylint.
+        :param: json_path the path of the JSON file
+        :param: grade the grade of the report
+        :param: max_in_memory the maximum number of code smells to keep in memory
+        :return: the report
+        """
+        with open(json_path, 'r', encoding='utf-8') as json_file:
+            return StreamingReport(json_file, grade, max_in_memory)
+
+    def is_clean(self):
+        """
+        Checks whether the report is "clean", i.e. that there are no code smells.
+        :return: true if the report is clean
+        """
+        return len(self.code_smells) == 0
+
+    def get_index(self) -> ReportIndex:
+        """
+        Gets the index of the code smells, which is built on the first call. The index only
+        keeps the positions of the code smells in memory.
+        :return: the index
+        """
+        if self._index is None:
+            self._index = ReportIndex(self.code_smells)
+        return self._index
+
+    def group_by_file(self):
+        """
+        Groups the code smells by their file. The files are in the order of their most severe
+        code smell, and the smells of a file are sorted by severity.
+        :return: a generator of lists of CodeSmells, one list per file
+        """
+        if self._by_file is None:
+            # The smells are added by severity, which the collection keeps within every file
+            ranks = {file: rank for rank, file in enumerate(self.get_index().files)}
+            self._by_file = SpilledCodeSmells(lambda s: ranks[s.location.path],
+                                              self._directory.name, self._max_in_memory // 2)
+            for smell in self.code_smells:
+                self._by_file.add(smell)
+        return (list(value) for _, value in groupby(self._by_file, lambda s: s.location.path))
+
+    def close(self):
+        """
+        Removes the run files from disk.
+        """
+        self._directory.cleanup()
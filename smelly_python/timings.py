@@ -0,0 +1,105 @@
+"""
+The timings module measures the wall time, CPU time and peak memory of the phases of a run,
+and can profile them with cProfile.
+"""
+import cProfile
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from os import path
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+
+def _get_usage():
+    """
+    Gets the CPU time of the process and its finished child processes, and the peak resident
+    set sizes.
+    :return: a tuple of the CPU seconds of the process, the CPU seconds of the children, and
+    the peak RSS in bytes of the process and of the largest child, which are None if unknown
+    """
+    if resource is None:
+        return time.process_time(), 0.0, None, None
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    # ru_maxrss is in kilobytes on Linux, but in bytes on macOS
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return own.ru_utime + own.ru_stime, children.ru_utime + children.ru_stime, \
+        own.ru_maxrss * scale, children.ru_maxrss * scale
+
+
+class PhaseTimer:
+    """
+    Records the measurements of every phase of a run.
+    The peak RSS of a phase is the peak of the process up to the end of that phase, as the
+    operating system does not reset it. Phases that are profiled keep their cProfile
+    statistics in memory until they are written.
+    """
+
+    def __init__(self, profile=False):
+        self.profile = profile
+        self.phases = []
+        self._profiles = {}
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name, profile=False):
+        """
+        Measures the code in the with block as a phase.
+        :param: name the name of the phase
+        :param: profile whether to profile the phase, if profiling is enabled
+        """
+        profiler = cProfile.Profile() if profile and self.profile else None
+        start_cpu, start_children_cpu, _, _ = _get_usage()
+        start = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                self._profiles[name] = profiler
+            wall = time.perf_counter() - start
+            cpu, children_cpu, peak_rss, children_peak_rss = _get_usage()
+            self.phases.append({
+                'name': name,
+                'wall_seconds': wall,
+                'cpu_seconds': cpu - start_cpu,
+                'children_cpu_seconds': children_cpu - start_children_cpu,
+                'peak_rss_bytes': peak_rss,
+                'children_peak_rss_bytes': children_peak_rss
+            })
+
+    def write(self, timings_path):
+        """
+        Writes the measurements of all phases as JSON.
+        :param: timings_path the path of the JSON file
+        """
+        with open(timings_path, 'w', encoding='utf-8') as timings_file:
+            json.dump({
+                'created': time.time(),
+                'wall_seconds': time.perf_counter() - self._start,
+                'phases': self.phases
+            }, timings_file, indent=2)
+
+    def write_profiles(self, directory):
+        """
+        Writes the cProfile statistics of the profiled phases, one file per phase, which can
+        be read with pstats or tools like snakeviz.
+        :param: directory the directory to write the statistics to
+        :return: the paths of the written files
+        """
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for name, profiler in self._profiles.items():
+            profile_path = path.join(directory, f'{name}.prof')
+            profiler.dump_stats(profile_path)
+            paths.append(profile_path)
+        return paths
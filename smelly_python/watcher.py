@@ -0,0 +1,48 @@
+"""
+The watcher module polls a directory for changed python files, so that the report can be
+updated while the user edits the code. Polling needs no extra services or packages.
+"""
+import os
+import time
+
+from smelly_python.pylint_runner import find_python_files
+
+DEFAULT_INTERVAL = 1.0
+
+
+def snapshot(directory):
+    """
+    Gets the modification time and size of every python file in the directory.
+    :param: directory the directory to scan
+    :return: a dictionary from file path to a tuple of the modification time and size
+    """
+    files = {}
+    for file in find_python_files(directory):
+        try:
+            status = os.stat(file)
+        except OSError:
+            # Removed while scanning
+            continue
+        files[file] = (status.st_mtime_ns, status.st_size)
+    return files
+
+
+def watch(directory, on_change, interval=DEFAULT_INTERVAL):
+    """
+    Polls the directory until the process is interrupted, and calls on_change when python
+    files were added, modified or removed.
+    :param: directory the directory to watch
+    :param: on_change a function that gets the list of added or modified files and the list
+    of removed files
+    :param: interval the number of seconds between two scans
+    """
+    previous = snapshot(directory)
+    while True:
+        time.sleep(interval)
+        current = snapshot(directory)
+        if current == previous:
+            continue
+        changed = [file for file, status in current.items() if previous.get(file) != status]
+        removed = [file for file in previous if file not in current]
+        previous = current
+        on_change(changed, removed)